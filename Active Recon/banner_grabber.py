@@ -1,31 +1,143 @@
+import queue
 import socket
-import ssl
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from active.probes import format_banner, probe_service
+from core.metrics import metrics
+
+DEFAULT_WORKERS = 20
+BANNER_TIMEOUT = 5
+
+# One keep-alive connection pool per host, shared by all worker threads
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Recent HTTP responses, so later stages (tech detection) need not refetch
+MAX_CACHED_RESPONSES = 256
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+
+def _response_key(scheme, host, port=None):
+    return scheme, host.lower(), port or (443 if scheme == "https" else 80)
+
+
+def _remember_response(scheme, host, port, response):
+    with _responses_lock:
+        key = _response_key(scheme, host, port)
+        _responses[key] = response
+        _responses.move_to_end(key)
+        while len(_responses) > MAX_CACHED_RESPONSES:
+            _responses.popitem(last=False)
+
+
+def get_cached_response(url):
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return None
+    with _responses_lock:
+        return _responses.get(_response_key(parsed.scheme, parsed.hostname, parsed.port))
+
+
+def _get_session(host):
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
+
+@metrics.timed("banner_grab")
+def _grab_port(ip_or_domain, port, hostname=None):
+    # `hostname` keeps the Host header / SNI right when scanning by IP
+    headers = {"Host": hostname} if hostname else None
+    try:
+        if port in [80, 8080]:  # HTTP
+            response = _get_session(ip_or_domain).get(f"http://{ip_or_domain}:{port}", headers=headers,
+                                                      timeout=BANNER_TIMEOUT)
+            _remember_response("http", hostname or ip_or_domain, port, response)
+            metrics.incr("banner.bytes_read", len(response.content))
+            server = response.headers.get("Server", "No Server Header")
+            return f"HTTP Banner: {server}"
+        elif port == 443:  # HTTPS
+            response = _get_session(ip_or_domain).get(f"https://{ip_or_domain}:{port}", headers=headers,
+                                                      timeout=BANNER_TIMEOUT, verify=False)
+            _remember_response("https", hostname or ip_or_domain, port, response)
+            metrics.incr("banner.bytes_read", len(response.content))
+            server = response.headers.get("Server", "No Server Header")
+            return f"HTTPS Banner: {server}"
+        else:
+            # Protocol-aware probes for everything else (FTP, SSH, TLS on odd ports, ...)
+            return format_banner(probe_service(ip_or_domain, port, hostname=hostname))
+    except requests.exceptions.RequestException as e:
+        if isinstance(e, requests.exceptions.Timeout):
+            metrics.incr("banner.timeouts")
+        return f"HTTP/HTTPS Error: {str(e)}"
+    except socket.timeout:
+        metrics.incr("banner.timeouts")
+        return "Connection timed out"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def iter_banners(ip_or_domain, ports, workers=DEFAULT_WORKERS, hostname=None):
+    # `ports` may be a live stream (e.g. ConnectScanner.scan): a feeder thread
+    # hands each open port to the pool as soon as it is found, and banners are
+    # yielded in completion order while the sweep is still running.
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(workers * 2)
+    pending = [0]
+    pending_lock = threading.Lock()
+    feeder_error = []
+    done = object()
+
+    def on_done(port, future):
+        slots.release()
+        results.put((port, future.result()))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def feed():
+            try:
+                for port in ports:
+                    slots.acquire()
+                    with pending_lock:
+                        pending[0] += 1
+                    future = executor.submit(_grab_port, ip_or_domain, port, hostname)
+                    future.add_done_callback(lambda f, port=port: on_done(port, f))
+            except Exception as e:
+                feeder_error.append(e)
+            finally:
+                results.put(done)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        feeding = True
+        while feeding or pending[0]:
+            item = results.get()
+            if item is done:
+                feeding = False
+                continue
+            with pending_lock:
+                pending[0] -= 1
+            yield item
+        feeder.join()
+
+    if feeder_error:
+        raise feeder_error[0]
+
 
-def grab_banner(ip_or_domain, ports):
-    results = {}
-    for port in ports:
-        try:
-            if port in [80, 8080]:  # HTTP
-                response = requests.get(f"http://{ip_or_domain}:{port}", timeout=5)
-                server = response.headers.get("Server", "No Server Header")
-                results[port] = f"HTTP Banner: {server}"
-            elif port == 443:  # HTTPS
-                response = requests.get(f"https://{ip_or_domain}", timeout=5, verify=False)
-                server = response.headers.get("Server", "No Server Header")
-                results[port] = f"HTTPS Banner: {server}"
-            else:
-                # Fallback to raw socket for other ports (FTP, SSH, etc.)
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                sock.connect((ip_or_domain, port))
-                banner = sock.recv(1024).decode(errors='ignore').strip()
-                results[port] = banner if banner else "No banner received"
-                sock.close()
-        except requests.exceptions.RequestException as e:
-            results[port] = f"HTTP/HTTPS Error: {str(e)}"
-        except socket.timeout:
-            results[port] = "Connection timed out"
-        except Exception as e:
-            results[port] = f"Error: {str(e)}"
-    return results
+def grab_banner(ip_or_domain, ports, workers=DEFAULT_WORKERS, hostname=None):
+    ports = list(ports)
+    results = dict(iter_banners(ip_or_domain, ports, workers, hostname))
+    return {port: results[port] for port in ports}
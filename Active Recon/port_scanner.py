@@ -1,5 +1,47 @@
+import errno
+import heapq
+import itertools
+import logging
+import selectors
 import socket
-from concurrent.futures import ThreadPoolExecutor
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows: no RLIMIT_NOFILE to read or raise
+    resource = None
+
+from active.port_spec import DEFAULT_PORT_SPEC, parse_port_spec
+from active.syn_scanner import DEFAULT_RATE, SynScanner, syn_available
+from core.metrics import metrics
+
+SCAN_BACKENDS = ("auto", "connect", "syn")
+
+# Per-host cap on sockets in flight, and the cap across all hosts in a batch
+DEFAULT_CONCURRENCY = 1000
+DEFAULT_GLOBAL_CONCURRENCY = 5000
+
+# nmap-style bounds for the per-host probe timeout (seconds); the initial
+# value matches the old fixed connect timeout until an RTT is measured
+INITIAL_RTT_TIMEOUT = 0.5
+MIN_RTT_TIMEOUT = 0.1
+MAX_RTT_TIMEOUT = 10.0
+
+# Congestion window bounds (probes in flight per host)
+INITIAL_WINDOW = 50
+MIN_WINDOW = 10
+# Back off when an epoch's timeout ratio exceeds the running baseline by this much
+LOSS_SPIKE = 0.25
+
+# Descriptors left for logs, reports, DNS and the banner/tech stages
+FD_RESERVE = 128
+
+# connect_ex() results that mean "handshake still in flight"
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EALREADY, errno.EWOULDBLOCK}
+# Local resource exhaustion: shrink the window instead of failing the port
+_EXHAUSTED = {errno.EMFILE, errno.ENFILE, errno.EADDRNOTAVAIL, errno.ENOBUFS}
+
 
 def scan_port(host, port):
     try:
@@ -12,12 +54,327 @@ def scan_port(host, port):
         return None
     return None
 
-def socket_scan(host):
-    open_ports = []
-    with ThreadPoolExecutor(max_workers=1000) as executor:
-        futures = [executor.submit(scan_port, host, port) for port in range(1, 65536)]
-        for future in futures:
-            port = future.result()
-            if port:
-                open_ports.append(port)
-    return open_ports
+
+class HostTiming:
+    # Smoothed RTT estimator (RFC 6298, as used by nmap) feeding the probe
+    # timeout, plus an AIMD congestion window that limits the send rate.
+
+    def __init__(self, max_window, initial_timeout=INITIAL_RTT_TIMEOUT):
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = initial_timeout
+        self.max_window = max(1, max_window)
+        self.window = float(min(INITIAL_WINDOW, self.max_window))
+        self.ssthresh = float(self.max_window)
+        self.probes = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.started = time.monotonic()
+        self._loss_baseline = None
+        self._epoch_start = self.started
+        self._epoch_done = 0
+        self._epoch_lost = 0
+
+    def on_sent(self):
+        self.probes += 1
+
+    def on_response(self, rtt):
+        self.responses += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.timeout = min(MAX_RTT_TIMEOUT, max(MIN_RTT_TIMEOUT, self.srtt + 4 * self.rttvar))
+        self._grow(1)
+        self._end_epoch_if_due(lost=False)
+
+    def _grow(self, settled):
+        if self.window < self.ssthresh:
+            self.window += settled
+        else:
+            self.window += settled / self.window
+        self.window = min(self.window, self.max_window)
+
+    def on_timeout(self):
+        self.timeouts += 1
+        self._end_epoch_if_due(lost=True)
+
+    def _end_epoch_if_due(self, lost):
+        self._epoch_done += 1
+        self._epoch_lost += lost
+        now = time.monotonic()
+        if now - self._epoch_start < self.timeout:
+            return
+
+        ratio = self._epoch_lost / self._epoch_done
+        if self._loss_baseline is not None and ratio > self._loss_baseline + LOSS_SPIKE:
+            self.ssthresh = max(MIN_WINDOW, self.window / 2)
+            self.window = self.ssthresh
+        else:
+            # Filtered ports time out by design; learn the host's normal ratio.
+            # Timeouts at that ratio say nothing about congestion, so they
+            # grow the window like answers do and a firewalled host ramps up.
+            if self._loss_baseline is None:
+                self._loss_baseline = ratio
+            else:
+                self._loss_baseline = 0.8 * self._loss_baseline + 0.2 * ratio
+            self._grow(self._epoch_lost)
+        self._epoch_start = now
+        self._epoch_done = 0
+        self._epoch_lost = 0
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.probes / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "rtt": round(self.srtt, 4) if self.srtt is not None else None,
+            "rttvar": round(self.rttvar, 4) if self.rttvar is not None else None,
+            "timeout": round(self.timeout, 4),
+            "window": int(self.window),
+            "rate": round(self.rate, 1),
+            "probes": self.probes,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+        }
+
+
+class _HostState:
+    __slots__ = ("host", "addr", "ports", "timing", "inflight", "retry")
+
+    def __init__(self, host, addr, ports, timing):
+        self.host = host
+        self.addr = addr
+        self.ports = ports
+        self.timing = timing
+        self.inflight = 0
+        self.retry = None
+
+
+class ConnectScanner:
+    # Selector-driven connect() scanner. One global scheduler interleaves
+    # (host, port) probes round-robin across all targets; each host is capped
+    # by its congestion window and `host_concurrency`, the whole run by
+    # `concurrency`. Ports are pulled lazily so memory stays flat.
+    # `on_done(host, port, is_open)` fires once per port as its probe settles
+    # (answered or timed out), which is what checkpoints record.
+
+    def __init__(self, concurrency=DEFAULT_GLOBAL_CONCURRENCY, host_concurrency=DEFAULT_CONCURRENCY,
+                 timeout=INITIAL_RTT_TIMEOUT, resolve=socket.gethostbyname, on_done=None):
+        self.concurrency = max(1, concurrency)
+        self.resolve = resolve
+        self.on_done = on_done
+        self.host_concurrency = max(1, host_concurrency)
+        self.initial_timeout = timeout
+        self.timing = {}
+        self.errors = {}
+
+    def scan(self, host, ports, skip=None):
+        for _, port in self.scan_many([host], ports, skip={host: skip} if skip else None):
+            yield port
+
+    def scan_many(self, hosts, ports, skip=None):
+        # `skip` maps host -> ports already scanned (e.g. by a resumed run)
+        skip = skip or {}
+        active = deque()
+        for host in hosts:
+            try:
+                addr = self.resolve(host)
+            except OSError as e:
+                self.errors[host] = str(e)
+                continue
+            timing = self.timing[host] = HostTiming(self.host_concurrency, self.initial_timeout)
+            done = skip.get(host)
+            pending = iter(ports) if not done else (port for port in ports if port not in done)
+            active.append(_HostState(host, addr, pending, timing))
+
+        limit = self.concurrency
+        started = time.perf_counter()
+        selector = selectors.DefaultSelector()
+        inflight = {}
+        deadlines = []
+        seq = itertools.count()
+
+        try:
+            while True:
+                idle = 0
+                while active and len(inflight) < limit and idle < len(active):
+                    state = active[0]
+                    active.rotate(-1)
+                    if state.inflight >= min(self.host_concurrency, int(state.timing.window)):
+                        idle += 1
+                        continue
+                    port = state.retry if state.retry is not None else next(state.ports, None)
+                    state.retry = None
+                    if port is None:
+                        active.pop()
+                        continue
+                    idle = 0
+                    try:
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    except OSError as e:
+                        if e.errno not in _EXHAUSTED or not inflight:
+                            raise
+                        limit = len(inflight)
+                        state.retry = port
+                        break
+                    sock.setblocking(False)
+                    sent = time.monotonic()
+                    result = sock.connect_ex((state.addr, port))
+                    if result in _IN_PROGRESS:
+                        state.timing.on_sent()
+                        state.inflight += 1
+                        selector.register(sock, selectors.EVENT_WRITE, port)
+                        inflight[sock] = (state, sent)
+                        heapq.heappush(deadlines, (sent + state.timing.timeout, next(seq), sock))
+                        continue
+                    sock.close()
+                    if result in _EXHAUSTED and inflight:
+                        limit = len(inflight)
+                        state.retry = port
+                        break
+                    state.timing.on_sent()
+                    state.timing.on_response(time.monotonic() - sent)
+                    if self.on_done:
+                        self.on_done(state.host, port, result == 0)
+                    if result == 0:
+                        yield state.host, port
+
+                if not inflight:
+                    if not active:
+                        break
+                    continue
+
+                wait = max(0.0, deadlines[0][0] - time.monotonic())
+                for key, _ in selector.select(wait):
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    state, sent = inflight.pop(sock)
+                    state.inflight -= 1
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error == 0 and sock.getsockname() == (state.addr, key.data):
+                        # Loopback self-connect: our own ephemeral port, not a listener
+                        error = errno.ECONNREFUSED
+                    sock.close()
+                    # SYN-ACK and RST both count as an answer for RTT purposes
+                    if error in (0, errno.ECONNREFUSED):
+                        state.timing.on_response(time.monotonic() - sent)
+                    if self.on_done:
+                        self.on_done(state.host, key.data, error == 0)
+                    if error == 0:
+                        yield state.host, key.data
+
+                # Anything still pending past its deadline is filtered/silent
+                now = time.monotonic()
+                while deadlines and (deadlines[0][0] <= now or deadlines[0][2] not in inflight):
+                    _, _, sock = heapq.heappop(deadlines)
+                    if sock in inflight:
+                        port = selector.unregister(sock).data
+                        state, _ = inflight.pop(sock)
+                        state.inflight -= 1
+                        sock.close()
+                        state.timing.on_timeout()
+                        if self.on_done:
+                            self.on_done(state.host, port, False)
+        finally:
+            for sock in inflight:
+                sock.close()
+            selector.close()
+            # Per-probe numbers are already kept per host; fold them in once
+            metrics.observe("port_scan", time.perf_counter() - started)
+            for host in hosts:
+                timing = self.timing.get(host)
+                if timing:
+                    metrics.incr("scan.probes", timing.probes)
+                    metrics.incr("scan.timeouts", timing.timeouts)
+
+
+def raise_fd_limit():
+    # Lifts the soft RLIMIT_NOFILE to the hard limit, which needs no privileges
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (OSError, ValueError):
+            logging.debug(f"Could not raise the open file limit above {soft}")
+    return soft
+
+
+def fd_budget(reserve=FD_RESERVE):
+    # Sockets this process may hold open at once, or None when unknown
+    soft = raise_fd_limit()
+    if soft is None or soft == getattr(resource, "RLIM_INFINITY", None):
+        return None
+    return max(1, soft - reserve)
+
+
+def make_scanner(backend="connect", concurrency=DEFAULT_GLOBAL_CONCURRENCY, host_concurrency=DEFAULT_CONCURRENCY,
+                 timeout=INITIAL_RTT_TIMEOUT, resolve=socket.gethostbyname, on_done=None, workers=1,
+                 rate=DEFAULT_RATE):
+    # "syn" needs a raw socket (root/CAP_NET_RAW) and fails without one;
+    # "auto" uses it when available and falls back to connect scanning.
+    # `rate` is the SYN backend's packets per second. workers > 1 shards
+    # the probes over that many processes.
+    if backend not in SCAN_BACKENDS:
+        raise ValueError(f"Unknown scan backend: {backend}")
+    if workers > 1:
+        # Imported here: the shard workers build their scanners through this module
+        from active.sharded_scan import ShardedScanner
+        return ShardedScanner(workers, backend=backend, concurrency=concurrency, host_concurrency=host_concurrency,
+                              timeout=timeout, resolve=resolve, on_done=on_done, rate=rate)
+    if backend != "connect":
+        if syn_available():
+            return SynScanner(timeout=timeout, rate=rate, resolve=resolve, on_done=on_done)
+        if backend == "syn":
+            raise OSError("SYN scanning needs raw socket access (root or CAP_NET_RAW) on Linux")
+        logging.warning("Raw sockets unavailable; falling back to connect scanning")
+    # Each in-flight probe holds a descriptor; stay under the process limit
+    # instead of discovering it through EMFILE
+    budget = fd_budget()
+    if budget is not None and concurrency > budget:
+        logging.info(f"Capping scan concurrency at {budget} (open file limit)")
+        concurrency = budget
+    return ConnectScanner(concurrency=concurrency, host_concurrency=host_concurrency, timeout=timeout,
+                          resolve=resolve, on_done=on_done)
+
+
+def scan_hosts(hosts, ports=None, concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+               host_concurrency=DEFAULT_CONCURRENCY, timeout=INITIAL_RTT_TIMEOUT, resolve=socket.gethostbyname,
+               on_done=None, skip=None, backend="connect", workers=1):
+    scanner = make_scanner(backend, concurrency=concurrency, host_concurrency=host_concurrency, timeout=timeout,
+                           resolve=resolve, on_done=on_done, workers=workers)
+    found = {host: [] for host in hosts}
+    if ports is None:
+        ports = parse_port_spec(DEFAULT_PORT_SPEC)
+    for host, port in scanner.scan_many(hosts, ports, skip=skip):
+        found[host].append(port)
+
+    results = {}
+    for host, open_ports in found.items():
+        if host in scanner.errors:
+            results[host] = {"open_ports": [], "timing": None, "error": scanner.errors[host]}
+        else:
+            results[host] = {"open_ports": sorted(open_ports), "timing": scanner.timing[host].as_dict()}
+    return results
+
+
+def scan_host(host, ports=None, concurrency=DEFAULT_CONCURRENCY, timeout=INITIAL_RTT_TIMEOUT,
+              resolve=socket.gethostbyname, backend="connect"):
+    result = scan_hosts([host], ports, concurrency=concurrency, host_concurrency=concurrency, timeout=timeout,
+                        resolve=resolve, backend=backend)[host]
+    if "error" in result:
+        raise OSError(result["error"])
+    return result
+
+
+def socket_scan(host, ports=None, concurrency=DEFAULT_CONCURRENCY, timeout=INITIAL_RTT_TIMEOUT, backend="connect"):
+    if isinstance(ports, str):
+        ports = parse_port_spec(ports)
+    return scan_host(host, ports, concurrency=concurrency, timeout=timeout, backend=backend)["open_ports"]
@@ -0,0 +1,180 @@
+import os
+from functools import lru_cache
+
+MAX_PORT = 65535
+DEFAULT_PORT_SPEC = "all"
+
+_TOP_PORTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "top-ports.txt")
+
+# Named service profiles; values use the same syntax as --ports
+SERVICE_PROFILES = {
+    "all": "1-65535",
+    "web": "80,81,443,591,593,3000,5000,8000,8008,8080-8090,8443,8888,9000,9443",
+    "mail": "25,110,143,465,587,993,995",
+    "db": "1433,1521,3306,5432,5984,6379,9042,9200,11211,27017",
+    "remote": "22,23,3389,5800,5900-5903",
+    "file": "20,21,69,139,445,873,2049",
+}
+
+
+class PortSet:
+    # Fixed 8 KiB bitmap over 0-65535, so "all ports" costs the same as one port
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, ports=()):
+        self._bits = bytearray((MAX_PORT + 1) // 8)
+        for port in ports:
+            self.add(port)
+
+    def add(self, port):
+        byte, bit = divmod(port, 8)
+        self._bits[byte] |= 1 << bit
+
+    def discard(self, port):
+        byte, bit = divmod(port, 8)
+        self._bits[byte] &= ~(1 << bit) & 0xFF
+
+    def add_range(self, start, end):
+        self._fill(start, end, True)
+
+    def discard_range(self, start, end):
+        self._fill(start, end, False)
+
+    def _fill(self, start, end, value):
+        # Whole bytes are set with one slice assignment; only the edges go bit by bit
+        update = self.add if value else self.discard
+        first, last = start // 8 + 1, end // 8
+        if first >= last:
+            for port in range(start, end + 1):
+                update(port)
+            return
+        for port in range(start, first * 8):
+            update(port)
+        self._bits[first:last] = (b"\xff" if value else b"\x00") * (last - first)
+        for port in range(last * 8, end + 1):
+            update(port)
+
+    def __contains__(self, port):
+        byte, bit = divmod(port, 8)
+        return 0 <= byte < len(self._bits) and bool(self._bits[byte] & (1 << bit))
+
+    def __len__(self):
+        return int.from_bytes(self._bits, "little").bit_count()
+
+    def __or__(self, other):
+        bits = int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little")
+        return PortSet.from_bytes(bits.to_bytes(len(self._bits), "little"))
+
+    def __sub__(self, other):
+        bits = int.from_bytes(self._bits, "little") & ~int.from_bytes(other._bits, "little")
+        return PortSet.from_bytes(bits.to_bytes(len(self._bits), "little"))
+
+    def __iter__(self):
+        for byte, value in enumerate(self._bits):
+            if not value:
+                continue
+            for bit in range(8):
+                if value & (1 << bit):
+                    yield byte * 8 + bit
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        ports = cls()
+        ports._bits[:len(data)] = data[:len(ports._bits)]
+        return ports
+
+    def to_spec(self):
+        # Compact "1-1024,3306,8080-8090" rendering for logs and reports
+        ranges = []
+        start = prev = None
+        for port in self:
+            if start is None:
+                start = prev = port
+            elif port == prev + 1:
+                prev = port
+            else:
+                ranges.append(f"{start}-{prev}" if start != prev else str(start))
+                start = prev = port
+        if start is not None:
+            ranges.append(f"{start}-{prev}" if start != prev else str(start))
+        return ",".join(ranges)
+
+
+def port_slice(ports, slices, index):
+    # Every `slices`-th port starting at `index`; successive indexes cover
+    # the whole set, which is how incremental runs rotate their sample
+    return PortSet(port for port in ports if port % slices == index % slices)
+
+
+@lru_cache(maxsize=1)
+def load_top_ports():
+    with open(_TOP_PORTS_FILE, encoding="utf-8") as f:
+        return tuple(int(line) for line in f if line.strip() and not line.startswith("#"))
+
+
+def _parse_port(value, token):
+    try:
+        port = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid port '{value}' in '{token}'")
+    if not 1 <= port <= MAX_PORT:
+        raise ValueError(f"Port {port} out of range in '{token}'")
+    return port
+
+
+def _token_ranges(token):
+    name = token.lower()
+    if name in SERVICE_PROFILES:
+        for sub in SERVICE_PROFILES[name].split(","):
+            yield from _token_ranges(sub)
+        return
+
+    if name.startswith("top"):
+        count = name[3:].lstrip("-")
+        top_ports = load_top_ports()
+        if not count.isdigit() or not 1 <= int(count) <= len(top_ports):
+            raise ValueError(f"Invalid profile '{token}' (use top-1 .. top-{len(top_ports)})")
+        for port in top_ports[:int(count)]:
+            yield port, port
+        return
+
+    if "-" in token:
+        start, end = token.split("-", 1)
+        start = _parse_port(start, token) if start else 1
+        end = _parse_port(end, token) if end else MAX_PORT
+        if start > end:
+            raise ValueError(f"Invalid range '{token}'")
+        yield start, end
+        return
+
+    port = _parse_port(token, token)
+    yield port, port
+
+
+def parse_port_spec(spec):
+    # e.g. "top-1000,8000-8100,!8080" or "web,db" or "1-1024,!22"
+    ports = PortSet()
+    excluded = []
+    included = False
+    for token in (t.strip() for t in str(spec).split(",")):
+        if not token:
+            continue
+        if token.startswith("!"):
+            excluded.extend(_token_ranges(token[1:].strip()))
+        else:
+            included = True
+            for start, end in _token_ranges(token):
+                ports.add_range(start, end)
+
+    if not included:
+        if not excluded:
+            raise ValueError("Empty port specification")
+        # Only exclusions given: start from the full range
+        ports.add_range(1, MAX_PORT)
+    for start, end in excluded:
+        ports.discard_range(start, end)
+    return ports
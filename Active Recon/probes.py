@@ -0,0 +1,219 @@
+import re
+import socket
+import ssl
+import time
+
+from core.metrics import metrics
+
+# A server-first greeting is sent on accept and lands about one round trip
+# after the connect completes, so the wait for it before sending a probe is
+# a few connect times, within these bounds. READ_TIMEOUT is the overall read
+# budget for one probe; reads stop early on a signature hit.
+NULL_PROBE_RTTS = 3
+NULL_PROBE_MIN_WAIT = 0.05
+NULL_PROBE_WAIT = 1.0
+READ_TIMEOUT = 2.0
+MAX_READ = 4096
+MAX_PROBES = 3
+
+# Ports where TLS is tried before plaintext
+TLS_PORTS = {443, 465, 563, 636, 853, 990, 992, 993, 994, 995, 2083, 2087, 4443, 5061, 6697, 8443, 9443}
+
+
+class Probe:
+    __slots__ = ("name", "payload", "ports")
+
+    def __init__(self, name, payload, ports=()):
+        self.name = name
+        self.payload = payload
+        self.ports = frozenset(ports)
+
+
+class Signature:
+    __slots__ = ("service", "pattern", "until", "version_group")
+
+    def __init__(self, service, pattern, until=None, version_group=1):
+        self.service = service
+        self.pattern = re.compile(pattern, re.DOTALL)
+        self.until = until
+        self.version_group = version_group
+
+
+# Payloads sent when a port stays silent. {host} is replaced with the Host
+# header / SNI name. Probes without ports are generic fallbacks.
+PROBES = [
+    Probe("http", b"GET / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\n\r\n",
+          ports=(80, 81, 443, 591, 593, 3000, 5000, 8000, 8008, 8080, 8081, 8443, 8888, 9000, 9443)),
+    Probe("redis", b"*1\r\n$4\r\nPING\r\n", ports=(6379,)),
+    Probe("memcached", b"version\r\n", ports=(11211,)),
+    Probe("rtsp", b"OPTIONS / RTSP/1.0\r\nCSeq: 1\r\n\r\n", ports=(554, 8554)),
+    Probe("elasticsearch", b"GET / HTTP/1.0\r\nHost: {host}\r\n\r\n", ports=(9200,)),
+    Probe("generic", b"\r\n\r\n"),
+]
+
+# Ordered most specific first; `until` keeps reading until that marker is seen
+SIGNATURES = [
+    Signature("ssh", rb"^SSH-[\d.]+-([^\r\n]+)"),
+    Signature("smtp", rb"^220[ -]([^\r\n]*(?:SMTP|Postfix|Exim|Sendmail|mail)[^\r\n]*)"),
+    Signature("ftp", rb"^220[ -]([^\r\n]*)"),
+    Signature("pop3", rb"^\+OK ?([^\r\n]*)"),
+    Signature("imap", rb"^\* OK ?([^\r\n]*)"),
+    Signature("http", rb"^HTTP/\d(?:\.\d)? \d{3}[^\r\n]*", until=b"\r\n\r\n", version_group=0),
+    Signature("rtsp", rb"^RTSP/1\.0 \d{3}[^\r\n]*", until=b"\r\n\r\n", version_group=0),
+    Signature("redis", rb"^(\+PONG|-NOAUTH[^\r\n]*|-ERR[^\r\n]*)"),
+    Signature("memcached", rb"^VERSION ([^\r\n]+)"),
+    Signature("mysql", rb"^.{4}\x0a([0-9][^\x00]*)\x00"),
+    Signature("vnc", rb"^RFB (\d{3}\.\d{3})"),
+    Signature("telnet", rb"^\xff[\xfb-\xfe]", version_group=0),
+    Signature("tls-alert", rb"^\x15\x03[\x00-\x04]", version_group=0),
+]
+
+# One combined pattern identifies the service in a single pass; the
+# per-signature pattern only runs afterwards to pull out the version text
+_SIGNATURE_INDEX = re.compile(
+    b"|".join(b"(?P<s%d>%s)" % (i, sig.pattern.pattern) for i, sig in enumerate(SIGNATURES)),
+    re.DOTALL,
+)
+
+_SERVER_HEADER = re.compile(rb"\r\nServer:[ \t]*([^\r\n]*)", re.IGNORECASE)
+
+_tls_context = ssl.create_default_context()
+_tls_context.check_hostname = False
+_tls_context.verify_mode = ssl.CERT_NONE
+
+
+def match_signature(data):
+    match = _SIGNATURE_INDEX.match(data)
+    if not match:
+        return None, None
+    signature = SIGNATURES[int(match.lastgroup[1:])]
+    detail = signature.pattern.match(data)
+    version = detail.group(signature.version_group).decode(errors="ignore").strip()
+    return signature, version
+
+
+def _read(sock, deadline):
+    # Read until a signature is recognized (and its `until` marker arrives),
+    # the peer closes, MAX_READ is reached or the deadline passes.
+    # Returns the data and whether the peer closed the connection.
+    data = b""
+    while len(data) < MAX_READ:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return data, False
+        sock.settimeout(remaining)
+        try:
+            chunk = sock.recv(MAX_READ - len(data))
+        except socket.timeout:
+            return data, False
+        except OSError:
+            return data, True
+        if not chunk:
+            return data, True
+        data += chunk
+        signature, _ = match_signature(data)
+        if signature and (signature.until is None or signature.until in data):
+            break
+    return data, False
+
+
+def _connect(host, port, hostname, use_tls, timeout):
+    sock = socket.create_connection((host, port), timeout=timeout)
+    if use_tls:
+        try:
+            sock = _tls_context.wrap_socket(sock, server_hostname=hostname or host)
+        except Exception:
+            sock.close()
+            raise
+    return sock
+
+
+def _probe_order(port):
+    specific = [probe for probe in PROBES if port in probe.ports]
+    fallback = [probe for probe in PROBES if not probe.ports or probe.name == "http"]
+    order = list(dict.fromkeys(specific + fallback))
+    # Client-speaks-first services get no null wait
+    wait_first = not specific
+    return wait_first, order[:MAX_PROBES]
+
+
+def _describe(data, use_tls):
+    signature, version = match_signature(data)
+    if signature is None:
+        text = data.decode(errors="ignore").strip()
+        return {"service": None, "banner": text.splitlines()[0] if text else "", "tls": use_tls}
+    if signature.service == "http":
+        server = _SERVER_HEADER.search(data)
+        version = server.group(1).decode(errors="ignore").strip() if server else "No Server Header"
+    return {"service": signature.service, "banner": version, "tls": use_tls}
+
+
+def _run_probes(host, port, hostname, use_tls, timeout):
+    # Returns (result, tls_suspected). A TLS server fed plaintext either
+    # answers with an alert record or hangs up without a word.
+    wait_first, order = _probe_order(port)
+    name = (hostname or host).encode()
+    hung_up = False
+
+    for index, probe in enumerate(order):
+        started = time.monotonic()
+        try:
+            sock = _connect(host, port, hostname, use_tls, timeout)
+        except OSError:
+            # Failed handshake: not TLS after all. Plaintext errors propagate.
+            if use_tls:
+                return None, False
+            raise
+        with sock:
+            data, closed = b"", False
+            if index == 0 and wait_first:
+                connected = time.monotonic()
+                wait = min(NULL_PROBE_WAIT, max(NULL_PROBE_MIN_WAIT, NULL_PROBE_RTTS * (connected - started)))
+                data, closed = _read(sock, connected + wait)
+            if not data and not closed:
+                try:
+                    sock.sendall(probe.payload.replace(b"{host}", name))
+                except OSError:
+                    closed = True
+                else:
+                    data, closed = _read(sock, time.monotonic() + timeout)
+
+        metrics.incr("banner.probes")
+        metrics.incr("banner.bytes_read", len(data))
+        if data:
+            signature, _ = match_signature(data)
+            if signature and signature.service == "tls-alert":
+                return None, not use_tls
+            return _describe(data, use_tls), False
+        if not closed:
+            # Silent even after a payload: further probes rarely help
+            break
+        hung_up = True
+        if probe.name == "http" and not use_tls:
+            # Hanging up on a plain HTTP request is the classic TLS tell
+            break
+    return None, hung_up and not use_tls
+
+
+def probe_service(host, port, hostname=None, timeout=READ_TIMEOUT):
+    # Plaintext first unless the port is a well-known TLS port; fall back to
+    # a TLS handshake on any port whose plaintext answer looks like TLS
+    if port in TLS_PORTS:
+        result, _ = _run_probes(host, port, hostname, True, timeout)
+        return result or _run_probes(host, port, hostname, False, timeout)[0]
+
+    result, tls_suspected = _run_probes(host, port, hostname, False, timeout)
+    if tls_suspected:
+        result = _run_probes(host, port, hostname, True, timeout)[0] or result
+    return result
+
+
+def format_banner(result):
+    if not result:
+        return "No banner received"
+    if result["service"] == "http":
+        return f"{'HTTPS' if result['tls'] else 'HTTP'} Banner: {result['banner']}"
+    prefix = "TLS " if result["tls"] else ""
+    if result["service"]:
+        return f"{prefix}{result['service'].upper()} Banner: {result['banner']}".strip()
+    return f"{prefix}{result['banner']}".strip() or "No banner received"
@@ -0,0 +1,211 @@
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import time
+from array import array
+
+from active.port_scanner import (DEFAULT_CONCURRENCY, DEFAULT_GLOBAL_CONCURRENCY, INITIAL_RTT_TIMEOUT, MIN_WINDOW,
+                                 fd_budget, make_scanner)
+from active.port_spec import PortSet, port_slice
+from active.syn_scanner import DEFAULT_RATE
+from core.metrics import metrics
+
+# Settled ports a worker buffers before sending them to the parent, and the
+# longest it holds a partial batch
+BATCH_PORTS = 4096
+BATCH_INTERVAL = 0.2
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class ShardTiming:
+    # Per-host timing folded together from every shard that probed the host
+
+    def __init__(self):
+        self.parts = []
+
+    def as_dict(self):
+        parts = self.parts
+        if not parts:
+            return None
+        rtts = [part["rtt"] for part in parts if part["rtt"] is not None]
+        windows = [part["window"] for part in parts if part["window"] is not None]
+        return {
+            "rtt": round(sum(rtts) / len(rtts), 4) if rtts else None,
+            "rttvar": max((part["rttvar"] for part in parts if part["rttvar"] is not None), default=None),
+            "timeout": max(part["timeout"] for part in parts),
+            "window": sum(windows) if windows else None,
+            "rate": round(sum(part["rate"] for part in parts), 1),
+            "probes": sum(part["probes"] for part in parts),
+            "responses": sum(part["responses"] for part in parts),
+            "timeouts": sum(part["timeouts"] for part in parts),
+        }
+
+
+def _scan_shard(shard, addresses, ports, skip, options, channel):
+    # Worker process: scans every host on its slice of the ports and streams
+    # settled ports back as packed arrays of port numbers, one open and one
+    # closed array per host, instead of a pickled tuple per port
+    budget = fd_budget()
+    concurrency = options["concurrency"]
+    if budget is not None:
+        concurrency = min(concurrency, budget)
+    batch = {}
+    pending = 0
+    flushed = time.monotonic()
+
+    def flush():
+        nonlocal pending, flushed
+        if batch:
+            channel.put(("ports", shard, {host: (opened.tobytes(), closed.tobytes())
+                                          for host, (opened, closed) in batch.items()}))
+            batch.clear()
+        pending = 0
+        flushed = time.monotonic()
+
+    def on_done(host, port, is_open):
+        nonlocal pending
+        opened, closed = batch.setdefault(host, (array("H"), array("H")))
+        (opened if is_open else closed).append(port)
+        pending += 1
+        if pending >= BATCH_PORTS or is_open or time.monotonic() - flushed >= BATCH_INTERVAL:
+            flush()
+
+    try:
+        scanner = make_scanner(options["backend"], concurrency=concurrency,
+                               host_concurrency=min(options["host_concurrency"], concurrency),
+                               timeout=options["timeout"], resolve=addresses.__getitem__, on_done=on_done,
+                               rate=options["rate"])
+        skip = {host: PortSet.from_bytes(data) for host, data in skip.items()}
+        for _ in scanner.scan_many(list(addresses), PortSet.from_bytes(ports), skip=skip):
+            pass
+        flush()
+        timing = {host: scanner.timing[host].as_dict() for host in scanner.timing}
+        channel.put(("done", shard, timing, scanner.errors))
+    except Exception as e:
+        flush()
+        channel.put(("failed", shard, str(e)))
+
+
+class ShardedScanner:
+    # Splits the (host, port) space over worker processes: worker i probes
+    # every host on the ports with port % workers == i, so one host or many
+    # spread evenly. Each worker runs its own scanner with its own event loop
+    # and descriptor budget; the per-host cap and the SYN packet rate are
+    # divided among them so a host sees the same load as from a single
+    # process. SYN workers each hold a raw socket, and the kernel hands
+    # every one of them a copy of every reply; each drops the ones its
+    # cookie does not match, so receive work grows with the worker count
+    # while sending is what gets spread. Same interface as
+    # ConnectScanner: scan()/scan_many() yield open ports, `timing`,
+    # `errors` and `on_done` behave the same.
+
+    def __init__(self, workers=None, backend="connect", concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                 host_concurrency=DEFAULT_CONCURRENCY, timeout=INITIAL_RTT_TIMEOUT, resolve=socket.gethostbyname,
+                 on_done=None, rate=DEFAULT_RATE):
+        self.workers = max(1, workers or default_workers())
+        self.backend = backend
+        self.concurrency = max(1, concurrency)
+        self.host_concurrency = max(1, host_concurrency)
+        self.timeout = timeout
+        self.rate = max(1, rate)
+        self.resolve = resolve
+        self.on_done = on_done
+        self.timing = {}
+        self.errors = {}
+
+    def scan(self, host, ports, skip=None):
+        for _, port in self.scan_many([host], ports, skip={host: skip} if skip else None):
+            yield port
+
+    def scan_many(self, hosts, ports, skip=None):
+        skip = skip or {}
+        # Resolved once here rather than once per worker
+        addresses = {}
+        for host in hosts:
+            try:
+                addresses[host] = self.resolve(host)
+            except OSError as e:
+                self.errors[host] = str(e)
+                continue
+            self.timing[host] = ShardTiming()
+        if not addresses:
+            return
+
+        ports = ports if isinstance(ports, PortSet) else PortSet(ports)
+        workers = max(1, min(self.workers, len(ports)))
+        options = {
+            "backend": self.backend,
+            "concurrency": self.concurrency,
+            "host_concurrency": max(MIN_WINDOW, self.host_concurrency // workers),
+            "timeout": self.timeout,
+            "rate": max(1, self.rate // workers),
+        }
+        skip_bytes = {host: skip[host].to_bytes() for host in addresses if skip.get(host)}
+        # Spawned, not forked: the parent runs logging and sink threads
+        # whose locks a forked child could inherit mid-acquire
+        context = multiprocessing.get_context("spawn")
+        channel = context.Queue()
+        processes = [
+            context.Process(target=_scan_shard, daemon=True,
+                            args=(shard, addresses, port_slice(ports, workers, shard).to_bytes(), skip_bytes,
+                                  options, channel))
+            for shard in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        logging.info(f"Scanning {len(addresses)} hosts x {len(ports)} ports across {workers} worker processes")
+
+        running = set(range(workers))
+        try:
+            while running:
+                try:
+                    message = channel.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that died without reporting never will
+                    for shard in list(running):
+                        if processes[shard].exitcode is not None:
+                            running.discard(shard)
+                            logging.error(f"Scan worker {shard} exited with code {processes[shard].exitcode}")
+                    continue
+                kind, shard = message[0], message[1]
+                if kind == "ports":
+                    for host, (opened, closed) in message[2].items():
+                        opened, closed = array("H", opened), array("H", closed)
+                        if self.on_done:
+                            for port in closed:
+                                self.on_done(host, port, False)
+                        for port in opened:
+                            if self.on_done:
+                                self.on_done(host, port, True)
+                            yield host, port
+                elif kind == "done":
+                    running.discard(shard)
+                    for host, timing in message[2].items():
+                        self.timing[host].parts.append(timing)
+                    for host, error in message[3].items():
+                        self.errors.setdefault(host, error)
+                else:
+                    running.discard(shard)
+                    logging.error(f"Scan worker {shard} failed: {message[2]}")
+            for host, timing in self.timing.items():
+                if not timing.parts:
+                    self.errors.setdefault(host, "every scan worker failed")
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            channel.close()
+            # Workers count into their own process; fold their totals in here
+            metrics.observe("port_scan", time.perf_counter() - started)
+            for timing in self.timing.values():
+                totals = timing.as_dict()
+                if totals:
+                    metrics.incr("scan.probes", totals["probes"])
+                    metrics.incr("scan.timeouts", totals["timeouts"])
@@ -0,0 +1,233 @@
+import errno
+import hashlib
+import os
+import select
+import socket
+import struct
+import sys
+import time
+
+from active.port_spec import PortSet
+from core.metrics import metrics
+
+# Packets per second across all hosts
+DEFAULT_RATE = 20000
+# Seconds to wait for stragglers after each pass before re-sending
+SYN_TIMEOUT = 1.0
+# Extra passes over ports that never answered
+SYN_RETRIES = 1
+RECV_BUFFER = 4 * 1024 * 1024
+
+_SYN = 0x02
+_RST = 0x04
+_ACK = 0x10
+
+
+def syn_available():
+    # Raw sockets need Linux and CAP_NET_RAW (root or a granted capability)
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP).close()
+    except OSError:
+        return False
+    return True
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _source_address(addr):
+    # The local address the kernel would route `addr` through
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.connect((addr, 9))
+        return probe.getsockname()[0]
+
+
+class SynTiming:
+    # Counters only: a stateless sweep does not measure per-probe RTT
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.rate = 0.0
+        self.probes = 0
+        self.responses = 0
+        self.timeouts = 0
+
+    def as_dict(self):
+        return {
+            "rtt": None,
+            "rttvar": None,
+            "timeout": round(self.timeout, 4),
+            "window": None,
+            "rate": round(self.rate, 1),
+            "probes": self.probes,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+        }
+
+
+class SynScanner:
+    # Half-open scanner on one raw socket. SYNs are paced out at `rate`; a
+    # single loop reads every reply. The sequence number of each SYN is a
+    # keyed hash of (address, port), so a reply is validated from its ACK
+    # number alone and no per-probe state is kept, only a bitmap per host
+    # of ports that have answered. The kernel answers SYN-ACKs with RST,
+    # so no connection is ever completed.
+
+    def __init__(self, timeout=SYN_TIMEOUT, retries=SYN_RETRIES, rate=DEFAULT_RATE,
+                 resolve=socket.gethostbyname, on_done=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.rate = max(1, rate)
+        self.resolve = resolve
+        self.on_done = on_done
+        self.timing = {}
+        self.errors = {}
+        self._outstanding = 0
+        self._secret = os.urandom(16)
+
+    def _cookie(self, addr, port):
+        digest = hashlib.blake2b(addr + port.to_bytes(2, "big"), key=self._secret, digest_size=4).digest()
+        return int.from_bytes(digest, "big")
+
+    def _packet(self, src, dst, sport, dport):
+        header = struct.pack("!HHIIBBHHH", sport, dport, self._cookie(dst, dport), 0, 5 << 4, _SYN, 64240, 0, 0)
+        pseudo = src + dst + struct.pack("!BBH", 0, socket.IPPROTO_TCP, len(header))
+        return header[:16] + struct.pack("!H", _checksum(pseudo + header)) + header[18:]
+
+    def scan(self, host, ports, skip=None):
+        for _, port in self.scan_many([host], ports, skip={host: skip} if skip else None):
+            yield port
+
+    def scan_many(self, hosts, ports, skip=None):
+        skip = skip or {}
+        targets = {}
+        for host in hosts:
+            try:
+                addr = socket.inet_aton(self.resolve(host))
+            except OSError as e:
+                self.errors[host] = str(e)
+                continue
+            # Names that resolve to the same address share its probes; every
+            # reply is credited to each of them
+            targets.setdefault(addr, []).append(host)
+            self.timing[host] = SynTiming(self.timeout)
+        if not targets:
+            return
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        # Holding a bound socket on the source port keeps the kernel from
+        # handing it to a real connection while SYN-ACKs come back to it
+        reserved = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+            sock.setblocking(False)
+            reserved.bind(("0.0.0.0", 0))
+            sport = reserved.getsockname()[1]
+            sources = {addr: socket.inet_aton(_source_address(socket.inet_ntoa(addr))) for addr in targets}
+            # Ports an address is done with: those already scanned for every name on it
+            answered = {}
+            for addr, names in targets.items():
+                done = PortSet.from_bytes((skip.get(names[0]) or PortSet()).to_bytes())
+                for host in names[1:]:
+                    done -= done - (skip.get(host) or PortSet())
+                answered[addr] = done
+            self._outstanding = sum(1 for addr in targets for port in ports if port not in answered[addr])
+            started = time.perf_counter()
+
+            for attempt in range(1 + self.retries):
+                sent = 0
+                pass_started = time.monotonic()
+                # Round-robin over hosts, one port each, until all are sent
+                queues = [(addr, iter(ports)) for addr in targets]
+                while queues:
+                    for entry in list(queues):
+                        addr, pending = entry
+                        port = next((p for p in pending if p not in answered[addr]), None)
+                        if port is None:
+                            queues.remove(entry)
+                            continue
+                        # Pace to `rate`, reading replies while we wait
+                        while sent >= self.rate * (time.monotonic() - pass_started):
+                            yield from self._receive(sock, sport, targets, answered, skip, 0.001)
+                        packet = self._packet(sources[addr], addr, sport, port)
+                        while True:
+                            try:
+                                sock.sendto(packet, (socket.inet_ntoa(addr), 0))
+                                break
+                            except OSError as e:
+                                if e.errno not in (errno.ENOBUFS, errno.EAGAIN):
+                                    raise
+                                yield from self._receive(sock, sport, targets, answered, skip, 0.005)
+                        sent += 1
+                        for host in targets[addr]:
+                            self.timing[host].probes += 1
+                    yield from self._receive(sock, sport, targets, answered, skip, 0)
+                deadline = time.monotonic() + self.timeout
+                while self._outstanding and time.monotonic() < deadline:
+                    yield from self._receive(sock, sport, targets, answered, skip, deadline - time.monotonic())
+                if not self._outstanding:
+                    break
+
+            elapsed = time.perf_counter() - started
+            for addr, names in targets.items():
+                for host in names:
+                    timing = self.timing[host]
+                    done = skip.get(host)
+                    silent = [port for port in ports if port not in answered[addr] and not (done and port in done)]
+                    timing.timeouts = len(silent)
+                    timing.rate = timing.probes / elapsed if elapsed else 0.0
+                    if self.on_done:
+                        for port in silent:
+                            self.on_done(host, port, False)
+                # Probes went out once per address, however many names share it
+                metrics.incr("scan.probes", self.timing[names[0]].probes)
+                metrics.incr("scan.timeouts", self.timing[names[0]].timeouts)
+            metrics.observe("port_scan", elapsed)
+        finally:
+            reserved.close()
+            sock.close()
+
+    def _receive(self, sock, sport, targets, answered, skip, wait):
+        # Drains every queued reply; yields (host, port) for each new SYN-ACK
+        if wait > 0:
+            select.select([sock], [], [], wait)
+        while True:
+            try:
+                packet = sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            header = (packet[0] & 0x0F) * 4
+            if len(packet) < header + 14:
+                continue
+            addr = packet[12:16]
+            names = targets.get(addr)
+            if names is None:
+                continue
+            port, dport, _, ack, _, flags = struct.unpack("!HHIIBB", packet[header:header + 14])
+            if dport != sport or port in answered[addr]:
+                continue
+            # Only a reply to our own SYN acknowledges cookie + 1
+            if ack != (self._cookie(addr, port) + 1) & 0xFFFFFFFF:
+                continue
+            is_open = flags & (_SYN | _ACK) == _SYN | _ACK
+            if not is_open and not flags & _RST:
+                continue
+            answered[addr].add(port)
+            self._outstanding -= 1
+            for host in names:
+                done = skip.get(host)
+                if done and port in done:
+                    continue
+                self.timing[host].responses += 1
+                if self.on_done:
+                    self.on_done(host, port, is_open)
+                if is_open:
+                    yield host, port
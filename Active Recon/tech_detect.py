@@ -1,10 +1,152 @@
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import requests
 from Wappalyzer import Wappalyzer, WebPage
 
-def detect_with_wappalyzer(url):
+from core.metrics import metrics
+from passive.result_cache import get_cache
+
+_wappalyzer = None
+_wappalyzer_lock = threading.Lock()
+
+# Same bound WebPage.new_from_url applied to its own fetch
+FETCH_TIMEOUT = 10
+
+# Analyses of recently seen responses, keyed by response content
+MAX_MEMO_ENTRIES = 1024
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+# Headers that differ between otherwise identical responses (timestamps,
+# request IDs, cache bookkeeping) and never decide a fingerprint
+VOLATILE_HEADERS = {
+    "age", "cf-ray", "content-length", "date", "etag", "expires", "last-modified", "nel", "report-to",
+    "x-amz-cf-id", "x-amz-request-id", "x-cache", "x-cache-hits", "x-request-id", "x-runtime", "x-served-by",
+    "x-timer",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _ruleset_key():
+    # Package version plus the bundled technologies.json's size and mtime
+    try:
+        version = importlib.metadata.version("python-Wappalyzer")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    spec = importlib.util.find_spec("Wappalyzer")
+    ruleset = os.path.join(os.path.dirname(spec.origin), "data", "technologies.json")
+    try:
+        stat = os.stat(ruleset)
+        version += f"-{stat.st_size}-{int(stat.st_mtime)}"
+    except OSError:
+        pass
+    return hashlib.sha1(version.encode()).hexdigest()[:16]
+
+
+def get_wappalyzer():
+    # Built once per process on first use, then shared by every detection.
+    # Not persisted: unpickling recompiles every pattern anyway, so a disk
+    # copy saves little and would load code from a writable directory.
+    global _wappalyzer
+    if _wappalyzer is None:
+        with _wappalyzer_lock:
+            if _wappalyzer is None:
+                _wappalyzer = Wappalyzer.latest()
+    return _wappalyzer
+
+
+def response_key(response):
+    # Body hash plus the headers fingerprints can match on. Parking pages,
+    # shared load balancers and SPA shells served under many names collapse
+    # to one key; only cookie names count, since values are per visitor.
+    # The favicon is not fetched: the ruleset never looks at its bytes.
+    digest = hashlib.sha256(response.content or b"")
+    for name, value in sorted((name.lower(), value) for name, value in response.headers.items()):
+        if name in VOLATILE_HEADERS:
+            continue
+        if name == "set-cookie":
+            value = ",".join(sorted(response.cookies.keys()))
+        digest.update(f"\n{name}:{value}".encode("utf-8", "replace"))
+    return digest.hexdigest()
+
+
+def _url_technologies(wappalyzer, url):
+    # Rules on the URL itself, plus whatever they imply; run per URL since
+    # the memo below is shared by every URL serving the same content
+    technologies = getattr(wappalyzer, "technologies", {})
+    found = {name for name, technology in technologies.items()
+             if any(pattern["regex"].search(url) for pattern in technology.get("url", ()))}
+    if found and hasattr(wappalyzer, "_get_implied_technologies"):
+        found |= wappalyzer._get_implied_technologies(found)
+    return found
+
+
+def _remembered(key):
+    with _memo_lock:
+        technologies = _memo.get(key)
+        if technologies is not None:
+            _memo.move_to_end(key)
+            return technologies
+    # Earlier runs: the on-disk result cache, keyed by ruleset too
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        hit, value = cache.get("tech", f"{_ruleset_key()}:{key}")
+    except sqlite3.Error as e:
+        logging.warning(f"Result cache read failed for tech:{key}: {e}")
+        return None
+    if not hit:
+        return None
+    technologies = frozenset(value)
+    _remember(key, technologies, persist=False)
+    return technologies
+
+
+def _remember(key, technologies, persist=True):
+    with _memo_lock:
+        _memo[key] = technologies
+        _memo.move_to_end(key)
+        while len(_memo) > MAX_MEMO_ENTRIES:
+            _memo.popitem(last=False)
+    cache = get_cache() if persist else None
+    if cache is not None:
+        try:
+            cache.put("tech", f"{_ruleset_key()}:{key}", sorted(technologies))
+        except sqlite3.Error as e:
+            logging.warning(f"Result cache write failed for tech:{key}: {e}")
+
+
+@metrics.timed("detect_with_wappalyzer")
+def detect_with_wappalyzer(url, response=None):
+    # `response` lets callers hand over a requests.Response they already have.
+    # Each distinct response body/headers is analyzed once, with the URL
+    # blanked so the memoized result holds for every URL serving it; the
+    # URL rules are then applied per URL.
     try:
-        webpage = WebPage.new_from_url(url)
-        wappalyzer = Wappalyzer.latest()
-        technologies = wappalyzer.analyze(webpage)
-        return set(technologies)
+        if response is not None:
+            metrics.incr("tech.responses_reused")
+        else:
+            response = requests.get(url, timeout=FETCH_TIMEOUT)
+        key = response_key(response)
+        technologies = _remembered(key)
+        if technologies is not None:
+            metrics.incr("tech.dedup_hits")
+            logging.info(f"Technology detection for {url} reused an identical response ({key[:12]})")
+        else:
+            metrics.incr("tech.analyses")
+            webpage = WebPage.new_from_response(response)
+            webpage.url = ""
+            technologies = frozenset(get_wappalyzer().analyze(webpage))
+            _remember(key, technologies)
+        return set(technologies) | _url_technologies(get_wappalyzer(), getattr(response, "url", None) or url)
     except Exception as e:
         return {"error": f"Technology detection failed: {str(e)}"}
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from active.banner_grabber import iter_banners
+from active.port_scanner import socket_scan
+from active.syn_scanner import syn_available
+from passive.dns_enum import get_dns_records, get_resolver
+from passive.result_cache import configure_cache
+from passive.whois_client import WhoisClient
+from report.jsonl_sink import JsonlSink
+from report.models import PortScanResult, ReconResult, TechResult
+from report.report_writer import render_html_report, save_report
+
+from standins import LOOPBACK, StandIns
+
+# Offline throughput/latency benchmarks against loopback stand-ins.
+# Usage: python run_benchmarks.py [--latency MS] [--repeat N] [--json FILE]
+# Each benchmark runs `repeat` times; the table shows the median wall time
+# and per-operation latency percentiles pooled across repeats.
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _bench_port_scan(standins, args, backend):
+    # Contiguous range around the stand-ins: a few open ports, the rest closed
+    ports = standins.open_ports
+    low = max(1, min(ports) - args.scan_padding)
+    high = min(65535, max(ports) + args.scan_padding)
+    start = time.perf_counter()
+    found = socket_scan(LOOPBACK, f"{low}-{high}", backend=backend)
+    wall = time.perf_counter() - start
+    missing = set(ports) - set(found)
+    return high - low + 1, wall, [], f"missed {sorted(missing)}" if missing else "ok"
+
+
+def bench_port_scan(standins, args, run):
+    return _bench_port_scan(standins, args, "connect")
+
+
+def bench_syn_scan(standins, args, run):
+    if not syn_available():
+        return 0, 0.0, [], "skipped (no raw sockets)"
+    return _bench_port_scan(standins, args, "syn")
+
+
+def _bench_banners(ports):
+    start = time.perf_counter()
+    latencies = []
+    banners = {}
+    for port, banner in iter_banners(LOOPBACK, ports):
+        latencies.append(time.perf_counter() - start)
+        banners[port] = banner
+    wall = time.perf_counter() - start
+    failed = [port for port, banner in banners.items() if "Error" in banner or "timed out" in banner]
+    return len(ports), wall, latencies, f"errors on {failed}" if failed else "ok"
+
+
+def bench_banners(standins, args, run):
+    return _bench_banners(standins.banner_ports)
+
+
+def bench_silent_banners(standins, args, run):
+    # Worst case: peers that accept and never speak
+    return _bench_banners([server.port for server in standins.silent_servers])
+
+
+def bench_dns(standins, args, run):
+    # Fresh names every run so the in-process answer cache never helps
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for index in range(args.dns_names):
+        began = time.perf_counter()
+        records = get_dns_records(f"bench-{run}-{index}.bench.test")
+        latencies.append(time.perf_counter() - began)
+        errors += not records["A"]["records"]
+    wall = time.perf_counter() - start
+    return args.dns_names, wall, latencies, f"{errors} names without A" if errors else "ok"
+
+
+def bench_whois(standins, args, run):
+    # Concurrent lookups through IANA -> registry -> registrar referrals; a
+    # fresh client per run so the TLD map is learned each time
+    client = WhoisClient(overrides=standins.whois.overrides, interval=0)
+    names = [f"bench-{run}-{index}.test" for index in range(args.whois_names)]
+    start = time.perf_counter()
+    results = client.lookup_many(names)
+    wall = time.perf_counter() - start
+    missing = [name for name, record in results.items() if not record or isinstance(record, Exception)
+               or record["registrar"] != "Bench Registrar, Inc."]
+    return len(names), wall, [], f"{len(missing)} lookups incomplete" if missing else "ok"
+
+
+def _synthetic_result(size):
+    result = ReconResult(domain="bench.test", url="http://bench.test")
+    result.resolved_ip = LOOPBACK
+    result.subdomains = [f"host{i}.bench.test" for i in range(size)]
+    result.ports = PortScanResult(spec="all", open_ports=list(range(1, size + 1)))
+    result.banners = {port: f"SSH: OpenSSH_9.6 build {port}" for port in result.ports.open_ports}
+    result.tech = TechResult(technologies=["Nginx", "PHP", "jQuery"])
+    return result
+
+
+def bench_text_report(standins, args, run):
+    result = _synthetic_result(args.report_size)
+    start = time.perf_counter()
+    save_report(result, format="txt")
+    save_report(result, format="json")
+    return 2, time.perf_counter() - start, [], "ok"
+
+
+def bench_jsonl_html(standins, args, run):
+    # Stream findings for many targets, then render the HTML from the file
+    path = f"reports/bench-{run}.jsonl"
+    records = 0
+    start = time.perf_counter()
+    with JsonlSink(path) as sink:
+        for target in range(args.report_targets):
+            name = f"host{target}.bench.test"
+            sink.emit("target", name, url=f"http://{name}", timestamp="2024-01-01 00:00:00")
+            for port in range(1, args.report_size // args.report_targets + 1):
+                sink.emit("open_port", name, port=port)
+                sink.emit("banner", name, port=port, banner="SSH: OpenSSH_9.6")
+                records += 2
+    render_html_report(path)
+    return records, time.perf_counter() - start, [], "ok"
+
+
+BENCHMARKS = [
+    ("port_scan", bench_port_scan),
+    ("port_scan (syn)", bench_syn_scan),
+    ("banner_grab", bench_banners),
+    ("banner_grab (silent)", bench_silent_banners),
+    ("get_dns_records", bench_dns),
+    ("whois lookups", bench_whois),
+    ("report txt+json", bench_text_report),
+    ("report jsonl+html", bench_jsonl_html),
+]
+
+
+def run(args):
+    configure_cache(enabled=False)
+    standins = StandIns(latency=args.latency / 1000, open_ports=args.open_ports, silent_ports=args.silent_ports)
+    resolver = get_resolver()
+    resolver.nameservers = [LOOPBACK]
+    resolver.port = standins.dns.port
+
+    rows = []
+    workdir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(workdir.name)
+    # Report writers print a line per file; keep the table readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        for name, bench in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            walls, latencies, ops, status = [], [], 0, "ok"
+            for index in range(args.repeat):
+                ops, wall, samples, outcome = bench(standins, args, index)
+                walls.append(wall)
+                latencies.extend(samples)
+                if outcome != "ok":
+                    status = outcome
+            wall = statistics.median(walls)
+            rows.append({
+                "benchmark": name,
+                "ops": ops,
+                "wall": round(wall, 4),
+                "ops_per_s": round(ops / wall, 1) if wall else None,
+                "p50": round(_percentile(latencies, 0.5), 4) if latencies else None,
+                "p95": round(_percentile(latencies, 0.95), 4) if latencies else None,
+                "status": status,
+            })
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        os.chdir(cwd)
+        workdir.cleanup()
+        standins.close()
+    return rows
+
+
+def format_table(rows, latency_ms):
+    lines = [f"Stand-in latency: {latency_ms} ms",
+             f"{'Benchmark':<22}{'Ops':>8}{'Wall':>10}{'Ops/s':>12}{'p50':>10}{'p95':>10}  Status"]
+    for row in rows:
+        p50 = f"{row['p50'] * 1000:.1f}ms" if row["p50"] is not None else "-"
+        p95 = f"{row['p95'] * 1000:.1f}ms" if row["p95"] is not None else "-"
+        lines.append(f"{row['benchmark']:<22}{row['ops']:>8}{row['wall']:>9.3f}s{row['ops_per_s']:>12}"
+                     f"{p50:>10}{p95:>10}  {row['status']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against loopback stand-in services")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial server latency in ms (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the median is reported")
+    parser.add_argument("--open-ports", type=int, default=8, help="Stand-in ports that send a banner")
+    parser.add_argument("--silent-ports", type=int, default=2, help="Stand-in ports that accept and never speak")
+    parser.add_argument("--scan-padding", type=int, default=2000,
+                        help="Closed ports scanned on each side of the stand-ins")
+    parser.add_argument("--dns-names", type=int, default=50, help="Names resolved per DNS run")
+    parser.add_argument("--whois-names", type=int, default=50, help="Domains looked up per WHOIS run")
+    parser.add_argument("--report-size", type=int, default=5000, help="Findings per report benchmark")
+    parser.add_argument("--report-targets", type=int, default=50, help="Targets in the JSONL/HTML benchmark")
+    parser.add_argument("--only", action="append", help="Run only the named benchmark (repeatable)")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    rows = run(args)
+    print(format_table(rows, args.latency))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latency_ms": args.latency, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import os
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Loopback stand-ins for the services the recon modules talk to. Every
+# server binds to 127.0.0.1 on an ephemeral port and answers after
+# `latency` seconds, so runs are repeatable and never leave the machine.
+
+LOOPBACK = "127.0.0.1"
+
+
+class BannerServer:
+    # Line-protocol service (SSH/FTP/SMTP style) that greets first.
+    # With banner=None it accepts and then stays silent until the client
+    # gives up, which is the slow path of the banner grabber.
+
+    def __init__(self, banner=b"SSH-2.0-OpenSSH_9.6 bench\r\n", latency=0.0):
+        self.banner = banner
+        self.latency = latency
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((LOOPBACK, 0))
+        self._sock.listen(512)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            if self.banner is None:
+                # Hold the connection open without a word
+                self._stopped.wait(10)
+                return
+            time.sleep(self.latency)
+            try:
+                conn.sendall(self.banner)
+                conn.settimeout(2)
+                conn.recv(1024)
+            except OSError:
+                pass
+
+    def close(self):
+        self._stopped.set()
+        self._sock.close()
+
+
+def _make_handler(latency, server_header):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        body = b"<html><head><title>bench</title></head><body>" + b"x" * 4096 + b"</body></html>"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Server", server_header)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+
+        def version_string(self):
+            return server_header
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class HttpServer:
+    # Threaded HTTP/1.1 server; with a certificate it serves HTTPS instead
+
+    def __init__(self, latency=0.0, server_header="nginx/1.25.3", certfile=None, keyfile=None):
+        self.httpd = ThreadingHTTPServer((LOOPBACK, 0), _make_handler(latency, server_header))
+        self.httpd.daemon_threads = True
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def self_signed_cert(directory):
+    # Returns (certfile, keyfile), or None when openssl is not installed
+    if not shutil.which("openssl"):
+        return None
+    certfile = os.path.join(directory, "bench-cert.pem")
+    keyfile = os.path.join(directory, "bench-key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True,
+    )
+    return certfile, keyfile
+
+
+# === DNS ===
+# Just enough of RFC 1035 to answer the record types get_dns_records asks for
+
+_TYPES = {1: "A", 2: "NS", 5: "CNAME", 6: "SOA", 15: "MX", 16: "TXT"}
+
+
+def _encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.rstrip(".").split(".")) + b"\x00"
+
+
+def _decode_question(packet):
+    labels, pos = [], 12
+    while packet[pos]:
+        length = packet[pos]
+        labels.append(packet[pos + 1:pos + 1 + length].decode())
+        pos += length + 1
+    qtype, _ = struct.unpack("!HH", packet[pos + 1:pos + 5])
+    return ".".join(labels), qtype, packet[12:pos + 5]
+
+
+def _rdata(rtype, name):
+    if rtype == "A":
+        return socket.inet_aton("127.0.0.1")
+    if rtype == "NS":
+        return _encode_name(f"ns1.{name}")
+    if rtype == "MX":
+        return struct.pack("!H", 10) + _encode_name(f"mail.{name}")
+    if rtype == "TXT":
+        text = b"v=spf1 -all"
+        return bytes([len(text)]) + text
+    if rtype == "SOA":
+        return (_encode_name(f"ns1.{name}") + _encode_name(f"hostmaster.{name}")
+                + struct.pack("!IIIII", 1, 3600, 600, 86400, 300))
+    return None
+
+
+class DnsServer:
+    # UDP responder: every name exists and has A/NS/MX/TXT/SOA records, no
+    # CNAME (so NoAnswer is exercised too). Names starting with "nx-" are
+    # NXDOMAIN. Replies are delayed by `latency` without blocking the socket.
+
+    def __init__(self, latency=0.0, ttl=300):
+        self.latency = latency
+        self.ttl = ttl
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((LOOPBACK, 0))
+        self.port = self._sock.getsockname()[1]
+        self.queries = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                packet, client = self._sock.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            try:
+                reply = self._answer(packet)
+            except (IndexError, struct.error, UnicodeDecodeError):
+                continue
+            if self.latency:
+                threading.Timer(self.latency, self._send, (reply, client)).start()
+            else:
+                self._send(reply, client)
+
+    def _send(self, reply, client):
+        try:
+            self._sock.sendto(reply, client)
+        except OSError:
+            pass
+
+    def _answer(self, packet):
+        name, qtype, question = _decode_question(packet)
+        rtype = _TYPES.get(qtype)
+        rdata = None if name.startswith("nx-") else _rdata(rtype, name)
+        rcode = 3 if name.startswith("nx-") else 0
+        flags = 0x8400 | (packet[2] & 0x01) << 8 | rcode
+        header = packet[:2] + struct.pack("!HHHHH", flags, 1, 1 if rdata else 0, 0, 0)
+        answer = b""
+        if rdata:
+            answer = b"\xc0\x0c" + struct.pack("!HHIH", qtype, 1, self.ttl, len(rdata)) + rdata
+        return header + question + answer
+
+    def close(self):
+        self._sock.close()
+
+
+class WhoisServer:
+    # Port-43 responder playing IANA, a thin registry and a registrar at
+    # once: a bare TLD gets a "refer:" to REGISTRY, a name gets a thin record
+    # pointing at REGISTRAR (which serves the full record from the same
+    # port). Names starting with "nx-" are not found. Bind to port 43 to
+    # stand in literally; the default is an ephemeral port.
+
+    REGISTRY = "whois.registry.test"
+    REGISTRAR = "whois.registrar.test"
+
+    def __init__(self, latency=0.0, port=0):
+        self.latency = latency
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((LOOPBACK, port))
+        self._sock.listen(128)
+        self.port = self._sock.getsockname()[1]
+        self.queries = 0
+        self._thin = set()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def overrides(self):
+        # WhoisClient(overrides=...) routing every server name here
+        address = (LOOPBACK, self.port)
+        return {"whois.iana.org": address, self.REGISTRY: address, self.REGISTRAR: address}
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                conn.settimeout(5)
+                query = conn.recv(1024).decode("ascii", "replace").strip().lower()
+                time.sleep(self.latency)
+                conn.sendall(self._answer(query).encode())
+            except OSError:
+                pass
+
+    def _answer(self, query):
+        with self._lock:
+            self.queries += 1
+            # The registry is asked first, the registrar second
+            registrar = query in self._thin
+            self._thin.symmetric_difference_update({query})
+        if "." not in query:
+            return f"% IANA WHOIS server\ndomain:       {query.upper()}\nrefer:        {self.REGISTRY}\n"
+        if query.startswith("nx-"):
+            self._thin.discard(query)
+            return f'No match for "{query.upper()}".\n'
+        if not registrar:
+            return (f"   Domain Name: {query.upper()}\n   Registrar WHOIS Server: {self.REGISTRAR}\n"
+                    f"   Registrar: Bench Registrar\n   Creation Date: 2001-01-01T00:00:00Z\n"
+                    f"   Name Server: NS1.{query.upper()}\n   Domain Status: ok\n")
+        return (f"Domain Name: {query}\nRegistrar: Bench Registrar, Inc.\n"
+                f"Registrar Abuse Contact Email: abuse@registrar.test\nUpdated Date: 2024-01-01T00:00:00Z\n"
+                f"Registrar Registration Expiration Date: 2030-01-01T00:00:00Z\n"
+                f"Registrant Organization: Bench Org\nRegistrant Country: NL\n"
+                f"Name Server: ns1.{query}\nName Server: ns2.{query}\nDNSSEC: unsigned\n")
+
+    def close(self):
+        self._sock.close()
+
+
+class StandIns:
+    # The full set used by the benchmark: open banner ports, silent ports,
+    # HTTP and HTTPS, closed ports in between, DNS and WHOIS
+
+    def __init__(self, latency=0.0, open_ports=8, silent_ports=2):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.banner_servers = [BannerServer(latency=latency) for _ in range(open_ports)]
+        self.silent_servers = [BannerServer(banner=None) for _ in range(silent_ports)]
+        self.http = HttpServer(latency=latency)
+        cert = self_signed_cert(self._tmp.name)
+        self.https = HttpServer(latency=latency, certfile=cert[0], keyfile=cert[1]) if cert else None
+        self.dns = DnsServer(latency=latency)
+        self.whois = WhoisServer(latency=latency)
+
+    @property
+    def open_ports(self):
+        servers = self.banner_servers + self.silent_servers + [self.http] + ([self.https] if self.https else [])
+        return sorted(server.port for server in servers)
+
+    @property
+    def banner_ports(self):
+        # Ports whose banner is expected without waiting for a timeout
+        return sorted([server.port for server in self.banner_servers] + [self.http.port]
+                      + ([self.https.port] if self.https else []))
+
+    def close(self):
+        for server in self.banner_servers + self.silent_servers + [self.http, self.dns, self.whois]:
+            server.close()
+        if self.https:
+            self.https.close()
+        self._tmp.cleanup()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Startup budget check for the CLI: imports main under `python -X importtime`
+# and fails (exit 1) when importing it takes longer than the budget or pulls
+# in a module that should only load with its flag. Run it from CI/cron with
+# the same environment the tool runs in, e.g.
+#   python Benchmarks/startup_budget.py --budget-ms 150
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 150.0
+# Heavy third-party packages that only the module behind a flag may import
+LAZY_ONLY = ("requests", "urllib3", "dns", "whois", "Wappalyzer", "bs4", "cProfile")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(code="import main"):
+    # Returns (cumulative microseconds for main, set of top-level packages imported)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    main_us = None
+    packages = set()
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        packages.add(name.split(".")[0])
+        if name == "main":
+            main_us = int(match.group(2))
+    return main_us, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CLI import time against a budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum median import time of main.py (default: {DEFAULT_BUDGET_MS} ms)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure; the median counts")
+    args = parser.parse_args()
+
+    timings = []
+    loaded = set()
+    for _ in range(args.runs):
+        main_us, packages = measure()
+        if main_us is None:
+            print("Could not find 'main' in the -X importtime output")
+            return 1
+        timings.append(main_us / 1000)
+        loaded |= packages
+
+    median = statistics.median(timings)
+    eager = sorted(set(LAZY_ONLY) & loaded)
+    print(f"import main: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(timings):.1f}, max {max(timings):.1f}); budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: startup over budget by {median - args.budget_ms:.1f} ms")
+        failed = True
+    if eager:
+        print(f"FAIL: imported at startup but should load lazily: {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
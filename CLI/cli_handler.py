@@ -1,31 +1,134 @@
 import argparse
+import ipaddress
+import os
+import sys
 from urllib.parse import urlparse
 
+from active.port_scanner import SCAN_BACKENDS
+from active.port_spec import DEFAULT_PORT_SPEC, parse_port_spec
+
 def handle_cli():
     parser = argparse.ArgumentParser(
         description="Custom Reconnaissance Tool - Perform subdomain enumeration, WHOIS, DNS lookup, port scanning, banner grabbing, and tech detection."
     )
 
     # Full URL input instead of separate domain and scheme
-    parser.add_argument("url", help="Target URL (e.g., http://example.com)")
+    parser.add_argument("url", nargs="?", help="Target URL (e.g., http://example.com)")
+
+    # Batch mode: any mix of a target file, a CIDR range and stdin
+    parser.add_argument("--targets", metavar="FILE", help="File with one URL/host per line ('-' for stdin)")
+    parser.add_argument("--cidr", action="append", default=[], help="Scan every host in a CIDR range (repeatable)")
 
     # Optional features
     parser.add_argument("--whois", action="store_true", help="Perform WHOIS lookup")
     parser.add_argument("--dns", action="store_true", help="Perform DNS enumeration")
     parser.add_argument("--subdomains", action="store_true", help="Perform subdomain enumeration")
-    parser.add_argument("--ports", action="store_true", help="Perform full port scanning (1-65535)")
+    parser.add_argument("--ports", nargs="?", const=DEFAULT_PORT_SPEC, metavar="SPEC",
+                        help="Perform port scanning. SPEC mixes ranges, lists, profiles (top-100, top-1000, "
+                             "web, mail, db, remote, file, all) and !exclusions, e.g. 'top-1000,8000-8100,!8080' "
+                             "(default: all ports 1-65535)")
+    parser.add_argument("--scan-backend", choices=SCAN_BACKENDS, default="connect",
+                        help="Port scan method: full TCP connects, raw-socket SYN (half-open; needs root or "
+                             "CAP_NET_RAW on Linux), or auto to use SYN when permitted (default: connect)")
+    parser.add_argument("--workers", nargs="?", type=int, default=1, const=0, metavar="N",
+                        help="Shard the port scan over N processes (no N: one per CPU core; default: 1)")
     parser.add_argument("--banner", action="store_true", help="Perform banner grabbing on open ports")
     parser.add_argument("--tech", action="store_true", help="Detect technologies using Wappalyzer")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk cache of WHOIS, DNS and subdomain lookups")
+    parser.add_argument("--expand", action="store_true",
+                        help="Resolve discovered subdomains and run --ports/--banner/--tech once per unique live IP")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run of the same job from its checkpoint")
+    parser.add_argument("--diff", action="store_true",
+                        help="Report only what changed since the previous run of each target")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Replace per-finding output with a single live progress line")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and write the profile next to the report")
+    parser.add_argument("--incremental", nargs="?", type=float, const=0.05, metavar="FRACTION",
+                        help="Re-probe only ports open in the previous run plus a rotating FRACTION of the rest "
+                             "(default: 0.05)")
 
     args = parser.parse_args()
 
+    # A bare --ports right before the target swallows the URL as its SPEC;
+    # no port spec contains "://", so hand it back to the positional
+    if args.ports and "://" in args.ports and not args.url:
+        args.url = args.ports
+        args.ports = DEFAULT_PORT_SPEC
+
+    args.port_set = None
+    if args.ports:
+        try:
+            args.port_set = parse_port_spec(args.ports)
+        except ValueError as e:
+            parser.error(f"Invalid --ports value: {e}")
+
+    if args.workers < 0:
+        parser.error("--workers N must be 0 (one per core) or more")
+    if args.workers == 0:
+        args.workers = os.cpu_count() or 1
+
+    if args.expand and not args.subdomains:
+        parser.error("--expand requires --subdomains")
+
+    if args.incremental is not None:
+        if not args.ports:
+            parser.error("--incremental requires --ports")
+        if not 0 < args.incremental <= 1:
+            parser.error("--incremental FRACTION must be between 0 and 1")
+
+    if not args.url and not args.targets and not args.cidr:
+        parser.error("Provide a target URL, --targets FILE or --cidr RANGE.")
+
     # Parse the input URL to extract scheme and domain
-    parsed_url = urlparse(args.url)
-    if not parsed_url.scheme or not parsed_url.netloc:
-        parser.error("Invalid URL format. Example usage: http://example.com")
+    args.target_list = []
+    if args.url:
+        parsed_url = urlparse(args.url)
+        if not parsed_url.scheme or not parsed_url.netloc:
+            parser.error("Invalid URL format. Example usage: http://example.com")
+        args.target_list.append((parsed_url.netloc, parsed_url.scheme))
+
+    try:
+        args.target_list.extend(load_targets(args.targets, args.cidr))
+    except (OSError, ValueError) as e:
+        parser.error(f"Could not load targets: {e}")
 
-    # Attach parsed parts for easier access
-    args.domain = parsed_url.netloc
-    args.scheme = parsed_url.scheme
+    # Attach parsed parts of the first target for single-target runs
+    args.domain, args.scheme = args.target_list[0] if args.target_list else (None, None)
+    if not args.domain:
+        parser.error("No targets to scan.")
+    args.batch = len(args.target_list) > 1
 
     return args
+
+def parse_target(line):
+    # Accept full URLs as well as bare hostnames/IPs (defaulting to http)
+    if "://" in line:
+        parsed = urlparse(line)
+        if not parsed.netloc:
+            raise ValueError(f"Invalid target: {line}")
+        return parsed.netloc, parsed.scheme
+    return line, "http"
+
+def load_targets(targets_file=None, cidrs=()):
+    targets = []
+    if targets_file:
+        handle = sys.stdin if targets_file == "-" else open(targets_file, encoding="utf-8")
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    targets.append(parse_target(line))
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+    for cidr in cidrs:
+        network = ipaddress.ip_network(cidr, strict=False)
+        hosts = list(network.hosts()) or [network.network_address]
+        targets.extend((str(ip), "http") for ip in hosts)
+
+    # De-duplicate while keeping the input order
+    return list(dict.fromkeys(targets))
@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+from active.port_spec import PortSet
+
+CHECKPOINT_DIR = os.path.join("cache", "checkpoints")
+# Seconds between writes while port probes are settling
+CHECKPOINT_INTERVAL = 5.0
+STATE_VERSION = 1
+
+
+def run_key(args):
+    # Identifies "the same job": identical targets, ports and modules
+    job = {
+        "targets": args.target_list,
+        "ports": args.port_set.to_spec() if args.port_set else None,
+        "modules": [flag for flag in ("subdomains", "whois", "dns", "banner", "tech", "expand") if getattr(args, flag)],
+    }
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _encode_ports(ports):
+    return base64.b64encode(zlib.compress(ports.to_bytes(), 9)).decode("ascii")
+
+
+def _decode_ports(data):
+    return PortSet.from_bytes(zlib.decompress(base64.b64decode(data)))
+
+
+class Checkpoint:
+    # On-disk progress of one run: per host, a bitmap of ports whose probe
+    # has settled plus the open ones among them; per target, the stages that
+    # finished and the result sections they produced. Writes are atomic
+    # (temp file + rename), so a kill mid-write leaves the previous state.
+
+    def __init__(self, path, key, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.key = key
+        self.interval = interval
+        self.findings = None
+        self._hosts = {}
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def open(cls, args, resume=False, directory=CHECKPOINT_DIR):
+        key = run_key(args)
+        checkpoint = cls(os.path.join(directory, f"{key}.json"), key)
+        if resume:
+            checkpoint._load()
+        return checkpoint
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            logging.info(f"No checkpoint at {self.path}; starting from scratch")
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return
+        if state.get("version") != STATE_VERSION or state.get("key") != self.key:
+            logging.warning(f"Ignoring checkpoint {self.path}: written by a different job")
+            return
+        self.findings = state.get("findings")
+        for host, progress in state["hosts"].items():
+            self._hosts[host] = {"done": _decode_ports(progress["done"]), "open": set(progress["open"])}
+        self._targets = state["targets"]
+        logging.info(f"Resuming from {self.path}: {len(self._hosts)} hosts, {len(self._targets)} targets")
+
+    @property
+    def resumed(self):
+        return bool(self._hosts or self._targets)
+
+    # === Port progress ===
+
+    def port_done(self, host, port, is_open):
+        with self._lock:
+            progress = self._hosts.get(host)
+            if progress is None:
+                progress = self._hosts[host] = {"done": PortSet(), "open": set()}
+            progress["done"].add(port)
+            if is_open:
+                progress["open"].add(port)
+            self._dirty = True
+        self.maybe_save()
+
+    def scanned_ports(self, host):
+        with self._lock:
+            progress = self._hosts.get(host)
+            return PortSet.from_bytes(progress["done"].to_bytes()) if progress else PortSet()
+
+    def open_ports(self, host):
+        progress = self._hosts.get(host)
+        return sorted(progress["open"]) if progress else []
+
+    # === Stage progress ===
+
+    def finish_stage(self, target, stage, result):
+        with self._lock:
+            entry = self._targets.setdefault(target, {"stages": [], "result": None, "finished": False})
+            if stage not in entry["stages"]:
+                entry["stages"].append(stage)
+            entry["result"] = result.to_dict()
+            self._dirty = True
+        self.save()
+
+    def finish_target(self, target):
+        with self._lock:
+            self._targets.setdefault(target, {"stages": [], "result": None, "finished": False})["finished"] = True
+            self._dirty = True
+        self.save()
+
+    def finished_stages(self, target):
+        entry = self._targets.get(target)
+        return (entry["stages"], entry["result"]) if entry else ([], None)
+
+    def target_finished(self, target):
+        return self._targets.get(target, {}).get("finished", False)
+
+    # === Persistence ===
+
+    def maybe_save(self):
+        if self._dirty and time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self):
+        # Serialised so an older snapshot can never overwrite a newer one
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                state = {
+                    "version": STATE_VERSION,
+                    "key": self.key,
+                    "findings": self.findings,
+                    "hosts": {host: {"done": _encode_ports(progress["done"]), "open": sorted(progress["open"])}
+                              for host, progress in self._hosts.items()},
+                    "targets": self._targets,
+                }
+                self._dirty = False
+                self._saved_at = time.monotonic()
+                encoded = json.dumps(state, default=str)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp = f"{self.path}.tmp"
+            try:
+                with open(temp, "w", encoding="utf-8") as f:
+                    f.write(encoded)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp, self.path)
+            except OSError as e:
+                logging.warning(f"Checkpoint write to {self.path} failed: {e}")
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
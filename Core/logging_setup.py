@@ -0,0 +1,48 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "tool.log")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# tool.log rolls over to tool.log.1 ... tool.log.N at this size
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_listener = None
+
+
+def setup_logging(level=logging.INFO, path=LOG_FILE, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+    # Callers only enqueue records; one background thread formats them and
+    # does the file I/O, so logging never blocks a scan thread on disk
+    global _listener
+    if _listener is not None:
+        return _listener
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level)
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    # Drains whatever is still queued before the process exits
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
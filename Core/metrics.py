@@ -0,0 +1,92 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Derived rates shown in the summary: label -> (counter, timer)
+RATES = {
+    "port scan probes/s": ("scan.probes", "port_scan"),
+    "banner bytes/s": ("banner.bytes_read", "banner_grab"),
+    "dns queries/s": ("dns.queries", "get_dns_records"),
+}
+
+
+class Metrics:
+    # Process-wide counters and timers. Hot loops aggregate locally and add
+    # their totals once (e.g. the scanner at the end of a sweep), so the
+    # lock is never taken per probe.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            calls, total, longest = self.timers.get(name, (0, 0.0, 0.0))
+            self.timers[name] = (calls + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def rates(self):
+        rates = {}
+        for label, (counter, timer) in RATES.items():
+            if counter in self.counters and self.timers.get(timer, (0, 0.0, 0.0))[1] > 0:
+                rates[label] = round(self.counters[counter] / self.timers[timer][1], 1)
+        return rates
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "timers": {name: {"calls": calls, "total": round(total, 4), "max": round(longest, 4)}
+                           for name, (calls, total, longest) in sorted(self.timers.items())},
+                "rates": self.rates(),
+            }
+
+    def summary(self):
+        snapshot = self.snapshot()
+        lines = [f"{'Timer':<28}{'Calls':>8}{'Total':>11}{'Mean':>11}{'Max':>11}"]
+        for name, timer in snapshot["timers"].items():
+            mean = timer["total"] / timer["calls"] if timer["calls"] else 0.0
+            lines.append(f"{name:<28}{timer['calls']:>8}{timer['total']:>10.3f}s{mean:>10.3f}s{timer['max']:>10.3f}s")
+        lines.append("")
+        lines.append(f"{'Counter':<28}{'Value':>12}")
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name:<28}{value:>12}")
+        for label, rate in snapshot["rates"].items():
+            lines.append(f"{label:<28}{rate:>12}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,233 @@
+import io
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Stage:
+    __slots__ = ("name", "func", "requires", "provides", "buffered")
+
+    def __init__(self, name, func, requires=(), provides=(), buffered=True):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        # Buffered stages print their whole section at once when they finish
+        self.buffered = buffered
+
+
+class Stream:
+    # Single-consumer channel for handing items from a running stage to a
+    # downstream stage that has already started (e.g. open ports -> banners)
+
+    _END = object()
+
+    def __init__(self, items=None):
+        self._queue = queue.Queue()
+        if items is not None:
+            for item in items:
+                self.put(item)
+            self.close()
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def close(self):
+        self._queue.put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            yield item
+
+
+class StageContext:
+    # What a stage sees: its inputs, plus publish() to hand an output to
+    # downstream stages before the stage itself has finished
+
+    def __init__(self, pipeline, stage):
+        self._pipeline = pipeline
+        self._stage = stage
+
+    def __getitem__(self, key):
+        return self._pipeline.values[key]
+
+    def get(self, key, default=None):
+        return self._pipeline.values.get(key, default)
+
+    def publish(self, key, value):
+        self._pipeline._publish(self._stage, key, value)
+
+
+class _StageOutput(io.TextIOBase):
+    # stdout proxy: prints from a buffered stage's thread are held back and
+    # written as one block, so concurrent sections never interleave
+
+    def __init__(self, target):
+        self.target = target
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            buffer.append(text)
+        else:
+            with self.lock:
+                self.target.write(text)
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            self.target.flush()
+
+    def begin(self):
+        self.local.buffer = []
+
+    def end(self):
+        buffer, self.local.buffer = self.local.buffer, None
+        with self.lock:
+            self.target.write("".join(buffer))
+            self.target.flush()
+
+
+class Pipeline:
+    # Runs stages as soon as everything they require has been published.
+    # Independent stages run concurrently; per-stage wall time and the
+    # critical path are recorded for the summary.
+
+    def __init__(self, stages, max_workers=None):
+        self.stages = list(stages)
+        self.max_workers = max_workers or max(1, len(self.stages))
+        self.values = {}
+        self.timings = {}
+        self.errors = {}
+        self.skipped = []
+        self._published_at = {}
+        self._producer = {}
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._started_at = None
+
+    def _publish(self, stage, key, value):
+        with self._lock:
+            if key in self.values:
+                return
+            self.values[key] = value
+            self._published_at[key] = time.monotonic() - self._started_at
+            self._producer[key] = stage.name if stage else None
+        self._events.put(("published", key))
+
+    def _run_stage(self, stage, output):
+        start = time.monotonic() - self._started_at
+        if stage.buffered and output:
+            output.begin()
+        error = None
+        try:
+            result = stage.func(StageContext(self, stage)) or {}
+            for key, value in result.items():
+                self._publish(stage, key, value)
+        except Exception as e:
+            error = e
+            logging.error(f"Stage {stage.name} failed: {e}")
+        finally:
+            if stage.buffered and output:
+                output.end()
+            self.timings[stage.name] = (start, time.monotonic() - self._started_at)
+            self._events.put(("done", stage, error))
+
+    def run(self, initial=None):
+        available = set(initial or ())
+        for stage in self.stages:
+            available.update(stage.provides)
+        for stage in self.stages:
+            missing = [key for key in stage.requires if key not in available]
+            if missing:
+                raise ValueError(f"Stage {stage.name} requires {missing}, which no stage provides")
+
+        self._started_at = time.monotonic()
+        for key, value in (initial or {}).items():
+            self._publish(None, key, value)
+
+        output = _StageOutput(sys.stdout) if not isinstance(sys.stdout, _StageOutput) else None
+        original_stdout = sys.stdout
+        if output:
+            sys.stdout = output
+        pending = list(self.stages)
+        running = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending or running:
+                    for stage in list(pending):
+                        if all(key in self.values for key in stage.requires):
+                            pending.remove(stage)
+                            running += 1
+                            executor.submit(self._run_stage, stage, output)
+                    if not running:
+                        break
+                    kind, *payload = self._events.get()
+                    if kind == "done":
+                        running -= 1
+                        stage, error = payload
+                        if error is not None:
+                            self.errors[stage.name] = error
+                        # Outputs a finished stage never produced can no longer arrive
+                        if error is not None or any(key not in self.values for key in stage.provides):
+                            pending = self._skip_unreachable(pending)
+        finally:
+            if output:
+                sys.stdout = original_stdout
+        self.skipped.extend(stage.name for stage in pending)
+        return self.values
+
+    def _skip_unreachable(self, pending):
+        # Drop pending stages whose inputs can no longer be produced by any
+        # running or still-runnable stage (repeated until nothing changes)
+        runnable = list(pending)
+        while True:
+            producing = set(self.values)
+            for stage in self.stages:
+                if stage.name not in self.timings and (stage in runnable or stage not in pending):
+                    producing.update(stage.provides)
+            blocked = [stage for stage in runnable if not all(key in producing for key in stage.requires)]
+            if not blocked:
+                return runnable
+            for stage in blocked:
+                runnable.remove(stage)
+                self.skipped.append(stage.name)
+
+    def critical_path(self):
+        # Walk back from the last stage to finish through whichever input
+        # arrived last; that chain bounded the total wall time
+        if not self.timings:
+            return []
+        by_name = {stage.name: stage for stage in self.stages}
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = []
+        while name:
+            path.append(name)
+            inputs = [key for key in by_name[name].requires if self._producer.get(key)]
+            if not inputs:
+                break
+            last = max(inputs, key=lambda key: self._published_at[key])
+            name = self._producer[last]
+        return list(reversed(path))
+
+    def summary(self):
+        lines = [f"{'Stage':<20}{'Start':>10}{'Wall time':>12}  Status"]
+        for stage in self.stages:
+            if stage.name in self.timings:
+                start, end = self.timings[stage.name]
+                status = "failed" if stage.name in self.errors else "ok"
+                lines.append(f"{stage.name:<20}{start:>9.2f}s{end - start:>11.2f}s  {status}")
+            elif stage.name in self.skipped:
+                lines.append(f"{stage.name:<20}{'-':>10}{'-':>12}  skipped")
+        total = max((end for _, end in self.timings.values()), default=0.0)
+        lines.append(f"Total wall time: {total:.2f}s")
+        lines.append(f"Critical path: {' -> '.join(self.critical_path()) or '-'}")
+        return "\n".join(lines)
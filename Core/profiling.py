@@ -0,0 +1,56 @@
+import cProfile
+import pstats
+import sys
+import threading
+
+
+class RunProfiler:
+    # cProfile before 3.12 only sees the thread that enabled it, while the
+    # real work happens in pipeline stage, scanner and grabber threads. Every
+    # thread started while profiling gets its own profile, and the finished
+    # ones are merged with the main thread's at the end. From 3.12 cProfile
+    # sits on sys.monitoring, sees all threads and allows one active
+    # profiler, so the main one is used alone.
+
+    def __init__(self):
+        self._main = cProfile.Profile()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._original_run = None
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            original = self._original_run = threading.Thread.run
+            profiler = self
+
+            def run(thread):
+                profile = cProfile.Profile()
+                with profiler._lock:
+                    profiler._threads.append((thread, profile))
+                profile.enable()
+                try:
+                    original(thread)
+                finally:
+                    profile.disable()
+
+            threading.Thread.run = run
+        self._main.enable()
+
+    def stop(self):
+        self._main.disable()
+        if self._original_run is not None:
+            threading.Thread.run = self._original_run
+            self._original_run = None
+
+    def stats(self, stream=None):
+        stats = pstats.Stats(self._main, stream=stream)
+        with self._lock:
+            threads = list(self._threads)
+        for thread, profile in threads:
+            # A profile can only be read once its thread has stopped it
+            if thread.is_alive():
+                continue
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        return stats
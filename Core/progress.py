@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+
+# Minimum seconds between redraws of the status line
+REFRESH_INTERVAL = 0.25
+
+# Finding record type -> label on the status line
+COUNTED = {
+    "open_port": "open ports",
+    "banner": "banners",
+    "subdomain": "subdomains",
+    "dns": "dns",
+    "tech": "tech",
+}
+
+
+class Progress:
+    # Single live status line for --quiet runs. Fed by the findings sink,
+    # it counts records instead of printing them and redraws at most every
+    # REFRESH_INTERVAL seconds, however fast findings arrive. A ticker
+    # thread also redraws when nothing arrives, so the clock keeps moving
+    # through long sweeps with no findings.
+
+    def __init__(self, total_targets=None, stream=None, interval=REFRESH_INTERVAL):
+        self.total_targets = total_targets
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.targets = 0
+        self.counts = dict.fromkeys(COUNTED.values(), 0)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._drawn_at = 0.0
+        self._width = 0
+        self._closed = threading.Event()
+        self._ticker = threading.Thread(target=self._tick, daemon=True)
+        self._ticker.start()
+
+    def record(self, record_type):
+        with self._lock:
+            if record_type == "target":
+                self.targets += 1
+            elif record_type in COUNTED:
+                self.counts[COUNTED[record_type]] += 1
+            else:
+                return
+            now = time.monotonic()
+            if now - self._drawn_at >= self.interval:
+                self._draw(now)
+
+    def _tick(self):
+        while not self._closed.wait(self.interval):
+            with self._lock:
+                now = time.monotonic()
+                if now - self._drawn_at >= self.interval:
+                    self._draw(now)
+
+    def _line(self, now):
+        targets = f"targets {self.targets}/{self.total_targets}" if self.total_targets else f"targets {self.targets}"
+        counts = " | ".join(f"{label} {count}" for label, count in self.counts.items())
+        return f"[{now - self._started:7.1f}s] {targets} | {counts}"
+
+    def _draw(self, now):
+        line = self._line(now)
+        # Pad over the remains of a longer previous line
+        self.stream.write("\r" + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+        self._drawn_at = now
+
+    def close(self):
+        self._closed.set()
+        self._ticker.join()
+        with self._lock:
+            self._draw(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
@@ -0,0 +1,64 @@
+import logging
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from passive.dns_enum import resolve
+
+DEFAULT_WORKERS = 100
+# Random labels looked up per zone to fingerprint wildcard DNS
+WILDCARD_PROBES = 2
+
+
+def _random_label():
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=16))
+
+
+def _normalize(name):
+    name = name.strip().lower().rstrip(".")
+    # crt.sh reports wildcard certificates as "*.example.com"
+    while name.startswith("*."):
+        name = name[2:]
+    return name
+
+
+def detect_wildcard(zone, probes=WILDCARD_PROBES):
+    # Any address a random, surely-unregistered label resolves to is a
+    # wildcard answer for `zone`
+    addresses = set()
+    for _ in range(probes):
+        addresses.update(resolve(f"{_random_label()}.{zone}", 'A')["records"])
+    return addresses
+
+
+def resolve_subdomains(names, workers=DEFAULT_WORKERS, check_wildcards=True):
+    # Resolves every name concurrently and groups the live ones by address, so
+    # downstream active stages see each host once however many names it has.
+    # Returns {"hosts": {ip: [names]}, "wildcard": [...], "unresolved": [...]}
+    names = sorted({name for name in map(_normalize, names) if name})
+
+    wildcards = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if check_wildcards:
+            zones = sorted({name.split(".", 1)[1] for name in names if "." in name})
+            wildcards = dict(zip(zones, executor.map(detect_wildcard, zones)))
+            for zone, addresses in wildcards.items():
+                if addresses:
+                    logging.info(f"Wildcard DNS detected for *.{zone}: {sorted(addresses)}")
+        answers = list(executor.map(lambda name: resolve(name, 'A')["records"], names))
+
+    hosts = {}
+    wildcard_names = []
+    unresolved = []
+    for name, addresses in zip(names, answers):
+        if not addresses:
+            unresolved.append(name)
+            continue
+        zone_wildcard = wildcards.get(name.split(".", 1)[1] if "." in name else "", set())
+        if zone_wildcard and set(addresses) <= zone_wildcard:
+            wildcard_names.append(name)
+            continue
+        for address in addresses:
+            hosts.setdefault(address, []).append(name)
+
+    return {"hosts": hosts, "wildcard": wildcard_names, "unresolved": unresolved}
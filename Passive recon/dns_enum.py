@@ -1,49 +1,107 @@
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.exception
 import dns.resolver
 
-def get_dns_records(domain):
-    records = {
-        'A': [], 
-        'MX': [], 
-        'TXT': [], 
-        'NS': [], 
-        'CNAME': [],
-        'SOA': []
-    }
-
-    try: 
-        a_records = dns.resolver.resolve(domain, 'A')
-        records['A'] = [r.to_text() for r in a_records]
-    except Exception as e:
-        records['A'] = [f"Error: {e}"]
+from core.metrics import metrics
+from passive.result_cache import SOURCE_TTLS, cached
 
-    try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        records['MX'] = [r.to_text() for r in mx_records]
-    except Exception as e:
-        records['MX'] = [f"Error: {e}"]
+RECORD_TYPES = ['A', 'MX', 'TXT', 'NS', 'CNAME', 'SOA']
 
-    try: 
-        ns_records = dns.resolver.resolve(domain, 'NS')
-        records['NS'] = [r.to_text() for r in ns_records]
-    except Exception as e:
-        records['NS'] = [f"Error: {e}"]
+DNS_TIMEOUT = 2.0
+DNS_LIFETIME = 5.0
+# How long "no such name / no answer" results are remembered
+NEGATIVE_TTL = 60
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+# (name, rdtype) -> (expires_at, result); shared by every stage in the process
+_answer_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_resolver():
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = dns.resolver.Resolver()
+            _resolver.timeout = DNS_TIMEOUT
+            _resolver.lifetime = DNS_LIFETIME
+        return _resolver
 
-    try:
-        txt_records = dns.resolver.resolve(domain, 'TXT')
-        records['TXT'] = [r.to_text() for r in txt_records]
-    except Exception as e:
-        records['TXT'] = [f"Error: {e}"]
 
+def _error(kind, exc):
+    return {"type": kind, "message": str(exc)}
+
+
+def resolve(name, rdtype):
+    # Returns {"records": [...], "ttl": int | None, "error": None | {"type", "message"}}
+    key = (name.lower().rstrip("."), rdtype)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _answer_cache.get(key)
+        if cached and cached[0] > now:
+            metrics.incr("dns.cache_hits")
+            return cached[1]
+
+    metrics.incr("dns.queries")
+    ttl = None
     try:
-        cname_records = dns.resolver.resolve(domain, 'CNAME')
-        records['CNAME'] = [r.to_text() for r in cname_records]
+        answer = get_resolver().resolve(name, rdtype)
+        ttl = answer.rrset.ttl
+        result = {"records": [r.to_text() for r in answer], "ttl": ttl, "error": None}
+    except dns.resolver.NXDOMAIN as e:
+        result = {"records": [], "ttl": None, "error": _error("NXDOMAIN", e)}
+        ttl = NEGATIVE_TTL
+    except dns.resolver.NoAnswer as e:
+        result = {"records": [], "ttl": None, "error": _error("NoAnswer", e)}
+        ttl = NEGATIVE_TTL
+    except dns.resolver.NoNameservers as e:
+        result = {"records": [], "ttl": None, "error": _error("NoNameservers", e)}
+    except dns.exception.Timeout as e:
+        metrics.incr("dns.timeouts")
+        result = {"records": [], "ttl": None, "error": _error("Timeout", e)}
     except Exception as e:
-        records['CNAME'] = [f"Error: {e}"]
+        result = {"records": [], "ttl": None, "error": _error(type(e).__name__, e)}
 
+    # Transient failures (timeouts, SERVFAIL) are not cached
+    if ttl:
+        with _cache_lock:
+            _answer_cache[key] = (now + ttl, result)
+    return result
+
+
+def resolve_host(name):
+    # IPv4 address for `name` via the shared cache; falls back to the system
+    # resolver (e.g. /etc/hosts entries) and raises OSError if both fail
     try:
-        soa_records = dns.resolver.resolve(domain, 'SOA')
-        records['SOA'] = [r.to_text() for r in soa_records]
-    except Exception as e:
-        records['SOA'] = [f"Error: {e}"]
+        return str(ipaddress.IPv4Address(name))
+    except ValueError:
+        pass
+    result = resolve(name, 'A')
+    for record in result["records"]:
+        return record
+    try:
+        return socket.gethostbyname(name)
+    except OSError:
+        error = result["error"]
+        raise OSError(f"Could not resolve {name}: {error['type'] if error else 'no A records'}")
+
+
+def _records_ttl(records):
+    # Persist no longer than the shortest record TTL allows
+    ttls = [result["ttl"] for result in records.values() if result["ttl"]]
+    return min(ttls + [SOURCE_TTLS["dns"][0]])
 
-    return records
+
+@metrics.timed("get_dns_records")
+@cached("dns", is_failure=lambda records: all(r["error"] for r in records.values()), ttl_of=_records_ttl)
+def get_dns_records(domain):
+    with ThreadPoolExecutor(max_workers=len(RECORD_TYPES)) as executor:
+        futures = {rtype: executor.submit(resolve, domain, rtype) for rtype in RECORD_TYPES}
+        return {rtype: future.result() for rtype, future in futures.items()}
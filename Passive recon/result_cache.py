@@ -0,0 +1,167 @@
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from core.metrics import metrics
+
+CACHE_PATH = os.path.join("cache", "passive.sqlite")
+MAX_ENTRIES = 20000
+
+# source -> (ttl for good results, ttl for failed/empty lookups), in seconds
+SOURCE_TTLS = {
+    "whois": (24 * 3600, 3600),
+    "crt.sh": (12 * 3600, 900),
+    "HackerTarget": (12 * 3600, 1800),
+    "dns": (3600, 300),
+    # Keyed by response content and ruleset, so only eviction retires them
+    "tech": (30 * 24 * 3600, 3600),
+}
+DEFAULT_TTLS = (3600, 300)
+
+
+class ResultCache:
+    # SQLite-backed key/value store shared by the passive modules. Entries
+    # expire per source, failures are cached briefly (negative caching) and
+    # the least recently used entries are evicted beyond `max_entries`.
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                negative INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+
+    def get(self, source, key):
+        # Returns (hit, value)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM entries WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM entries WHERE source = ? AND key = ?", (source, key))
+                    self._db.commit()
+                self.misses += 1
+                return False, None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE source = ? AND key = ?", (now, source, key))
+            self._db.commit()
+            self.hits += 1
+        return True, json.loads(row[0])
+
+    def put(self, source, key, value, negative=False, ttl=None):
+        positive_ttl, negative_ttl = SOURCE_TTLS.get(source, DEFAULT_TTLS)
+        if ttl is None:
+            ttl = negative_ttl if negative else positive_ttl
+        now = time.time()
+        encoded = json.dumps(value, default=str)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (source, key, value, negative, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, key, encoded, int(negative), now + ttl, now),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM entries WHERE rowid IN ("
+            "SELECT rowid FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_enabled = True
+_cache_lock = threading.Lock()
+
+
+def configure_cache(enabled=True, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+    global _cache, _cache_enabled
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+        _cache_enabled = enabled
+        if enabled:
+            try:
+                _cache = ResultCache(path, max_entries)
+            except sqlite3.Error as e:
+                logging.warning(f"Result cache disabled, could not open {path}: {e}")
+                _cache_enabled = False
+    return _cache
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None and _cache_enabled:
+            try:
+                _cache = ResultCache()
+            except sqlite3.Error as e:
+                logging.warning(f"Result cache unavailable: {e}")
+                return None
+        return _cache
+
+
+def cached(source, is_failure=lambda value: not value, ttl_of=None):
+    # Wraps a lookup whose first argument is the domain. Failed or empty
+    # results are stored with the source's (short) negative TTL; `ttl_of`
+    # may derive a tighter TTL from the value itself (e.g. DNS record TTLs).
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(domain, *args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return func(domain, *args, **kwargs)
+            key = domain.lower().rstrip(".")
+            try:
+                hit, value = cache.get(source, key)
+            except sqlite3.Error as e:
+                logging.warning(f"Result cache read failed for {source}:{key}: {e}")
+                return func(domain, *args, **kwargs)
+            if hit:
+                logging.info(f"[cache] {source} hit for {key}")
+                metrics.incr("cache.hits")
+                return value
+            metrics.incr("cache.misses")
+
+            value = func(domain, *args, **kwargs)
+            negative = is_failure(value)
+            try:
+                cache.put(source, key, value, negative=negative,
+                          ttl=None if negative or ttl_of is None else ttl_of(value))
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logging.warning(f"Result cache write failed for {source}:{key}: {e}")
+            return value
+        return wrapper
+    return decorator
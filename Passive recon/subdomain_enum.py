@@ -1,14 +1,24 @@
+import codecs
 import requests
 import logging
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-def setup_logger(verbose=False):
-    level = logging.DEBUG if verbose else logging.INFO
-    logging.basicConfig(
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        level=level
-    )
+from core.metrics import metrics
+from passive.result_cache import cached
+
+# A single crt.sh entry is tiny; anything bigger means the stream is malformed
+MAX_JSON_OBJECT = 1024 * 1024
+
+# name -> callable(domain) returning an iterable of subdomains
+SOURCES = {}
+
+def register_source(name):
+    def decorator(func):
+        SOURCES[name] = func
+        return func
+    return decorator
 
 def validate_domain(domain):
     pattern = r'^(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}$'
@@ -18,27 +28,64 @@ def validate_domain(domain):
         logging.error("Invalid domain format. Please enter a valid domain (e.g., example.com).")
         return False
 
+def iter_json_array(chunks):
+    # Yields the elements of a top-level JSON array from an iterable of text
+    # chunks, holding at most one element plus one chunk in memory
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element continues in the next chunk
+                break
+            yield item
+        buffer = buffer[pos:]
+        if len(buffer) > MAX_JSON_OBJECT:
+            raise ValueError("JSON element exceeds size limit")
+
+@register_source("crt.sh")
+@cached("crt.sh")
 def query_crtsh(domain):
     url = f'https://crt.sh/?q=%25.{domain}&output=json'
     logging.info(f"[*] Querying crt.sh for {domain}")
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code != 200:
-            logging.error("Failed to fetch data from crt.sh")
-            return []
-        data = json.loads(response.text)
-        subdomains = set()
-        for entry in data:
-            subdomain = entry['name_value']
-            if '\n' in subdomain:
-                subdomains.update(subdomain.split('\n'))
-            else:
-                subdomains.add(subdomain)
+        with requests.get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                logging.error("Failed to fetch data from crt.sh")
+                return []
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            chunks = (decoder.decode(chunk) for chunk in response.iter_content(chunk_size=64 * 1024))
+            subdomains = set()
+            for entry in iter_json_array(chunks):
+                subdomain = entry['name_value']
+                if '\n' in subdomain:
+                    subdomains.update(subdomain.split('\n'))
+                else:
+                    subdomains.add(subdomain)
         return list(subdomains)
     except Exception as e:
         logging.error(f"Error querying crt.sh: {e}")
         return []
 
+@register_source("HackerTarget")
+@cached("HackerTarget")
 def query_hackertarget(domain):
     url = f"https://api.hackertarget.com/hostsearch/?q={domain}"
     logging.info(f"[*] Querying HackerTarget for {domain}")
@@ -58,23 +105,26 @@ def query_hackertarget(domain):
         logging.error(f"Error querying HackerTarget: {e}")
         return []
 
-def enumerate_subdomains(domain, verbose=False):
-    setup_logger(verbose)
+@metrics.timed("enumerate_subdomains")
+def enumerate_subdomains(domain, verbose=False, sources=None):
+    # Logging is configured once by the application; `verbose` only decides
+    # whether per-source counts are logged at INFO or DEBUG
+    log = logging.info if verbose else logging.debug
 
     if not validate_domain(domain):
         logging.error("Domain validation failed. Exiting enumeration.")
         return []
 
+    selected = {name: SOURCES[name] for name in (sources or SOURCES)}
     all_subdomains = set()
 
-    # crt.sh
-    subdomains_crtsh = query_crtsh(domain)
-    logging.info(f"[+] Found {len(subdomains_crtsh)} subdomains from crt.sh")
-    all_subdomains.update(subdomains_crtsh)
-
-    # HackerTarget
-    subdomains_hackertarget = query_hackertarget(domain)
-    logging.info(f"[+] Found {len(subdomains_hackertarget)} subdomains from HackerTarget")
-    all_subdomains.update(subdomains_hackertarget)
+    # All sources are queried at once; results merge as each one finishes
+    with ThreadPoolExecutor(max_workers=len(selected) or 1) as executor:
+        futures = {name: executor.submit(source, domain) for name, source in selected.items()}
+        for name, future in futures.items():
+            found = future.result()
+            log(f"[+] Found {len(found)} subdomains from {name}")
+            metrics.incr(f"subdomains.{name}", len(found))
+            all_subdomains.update(found)
 
     return sorted(all_subdomains)
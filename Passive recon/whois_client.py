@@ -0,0 +1,291 @@
+import ipaddress
+import logging
+import re
+import socket
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from core.metrics import metrics
+
+WHOIS_PORT = 43
+IANA_SERVER = "whois.iana.org"
+QUERY_TIMEOUT = 10.0
+MAX_RESPONSE = 1024 * 1024
+DEFAULT_WORKERS = 16
+
+# Registries throttle per client address: at most this many open queries
+# per server, started at least this many seconds apart. A server that
+# answers with a rate-limit notice gets its interval doubled up to the cap.
+PER_SERVER_QUERIES = 2
+MIN_INTERVAL = 0.5
+MAX_INTERVAL = 10.0
+
+# Seeded so the most common TLDs skip the IANA round trip; the rest are
+# learned from IANA's "refer:" line on first use
+TLD_SERVERS = {
+    "com": "whois.verisign-grs.com",
+    "net": "whois.verisign-grs.com",
+    "org": "whois.pir.org",
+}
+
+# Servers that want something other than the bare name
+QUERY_FORMATS = {
+    "whois.verisign-grs.com": "={}",
+    "whois.denic.de": "-T dn,ace {}",
+    "whois.jprs.jp": "{}/e",
+}
+
+_NOT_FOUND = re.compile(
+    r"^[%#>\s]*(no match|not found|no data found|no entries found|domain not found|no object found"
+    r"|object does not exist|status:\s*(free|available))",
+    re.IGNORECASE | re.MULTILINE,
+)
+_THROTTLED = re.compile(r"(rate limit|limit exceeded|exceeded .*quota|too many (queries|requests)|try again later)",
+                        re.IGNORECASE)
+_REFER = re.compile(r"^\s*(?:refer|whois):\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+# Report field -> labels it appears under across registries. Field names
+# match python-whois, so reports and history keep their keys.
+FIELD_LABELS = {
+    "domain_name": ("Domain Name", "domain"),
+    "registrar": ("Registrar", "Sponsoring Registrar", "registrar name"),
+    "whois_server": ("Registrar WHOIS Server", "whois server"),
+    "updated_date": ("Updated Date", "Last Modified", "last-update", "changed", "Last Updated On"),
+    "creation_date": ("Creation Date", "Created On", "created", "Registration Time", "Registered on"),
+    "expiration_date": ("Registry Expiry Date", "Registrar Registration Expiration Date", "Expiration Date",
+                        "Expiry Date", "paid-till", "expires"),
+    "name_servers": ("Name Server", "nserver", "Nameservers"),
+    "status": ("Domain Status", "status"),
+    "dnssec": ("DNSSEC",),
+    "org": ("Registrant Organization", "org"),
+    "country": ("Registrant Country", "country"),
+}
+LIST_FIELDS = {"name_servers", "status", "emails"}
+
+
+class WhoisRecord(Mapping):
+    # Raw WHOIS text behind a read-only mapping of report fields. A field
+    # is only searched for the first time it is read, and only the fields
+    # in FIELD_LABELS (plus emails) are ever extracted.
+
+    def __init__(self, text, servers=()):
+        self.text = text
+        self.servers = list(servers)
+        self._parsed = {}
+
+    def _parse(self, field):
+        if field == "emails":
+            values = _EMAIL.findall(self.text)
+        else:
+            labels = "|".join(re.escape(label) for label in FIELD_LABELS[field])
+            values = [match.strip() for match in
+                      re.findall(rf"^\s*(?:{labels})\s*:[ \t]*(\S.*?)\s*$", self.text, re.IGNORECASE | re.MULTILINE)]
+        seen = {}
+        for value in values:
+            seen.setdefault(value.lower(), value.lower() if field == "name_servers" else value)
+        values = list(seen.values())
+        if field in LIST_FIELDS:
+            return values or None
+        return values[0] if values else None
+
+    def __getitem__(self, field):
+        if field not in FIELD_LABELS and field != "emails":
+            raise KeyError(field)
+        if field not in self._parsed:
+            self._parsed[field] = self._parse(field)
+        return self._parsed[field]
+
+    def __iter__(self):
+        return iter((*FIELD_LABELS, "emails"))
+
+    def __len__(self):
+        return len(FIELD_LABELS) + 1
+
+    def as_dict(self):
+        # Plain dict of the fields present, for caching and the report
+        return {field: value for field, value in self.items() if value is not None}
+
+
+class _ServerGate:
+    # Per-server concurrency cap and minimum spacing between queries
+
+    def __init__(self, queries, interval):
+        self.slots = threading.BoundedSemaphore(queries)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait_turn(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def back_off(self):
+        with self._lock:
+            self.interval = min(MAX_INTERVAL, max(self.interval * 2, MIN_INTERVAL))
+
+
+class WhoisClient:
+    # Port-43 client that learns the TLD -> registry map once per process,
+    # follows one registrar referral ("Registrar WHOIS Server:") from thin
+    # registries, and rate-limits per server so concurrent lookups across a
+    # batch do not get the client address throttled. `overrides` maps a
+    # server name to (address, port), e.g. a local stand-in for tests.
+
+    def __init__(self, overrides=None, timeout=QUERY_TIMEOUT, per_server=PER_SERVER_QUERIES,
+                 interval=MIN_INTERVAL, iana_server=IANA_SERVER):
+        self.overrides = dict(overrides or {})
+        self.timeout = timeout
+        self.per_server = per_server
+        self.interval = interval
+        self.iana_server = iana_server
+        self.tld_servers = dict(TLD_SERVERS)
+        self._gates = {}
+        self._tld_locks = {}
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def _gate(self, server):
+        with self._lock:
+            gate = self._gates.get(server)
+            if gate is None:
+                gate = self._gates[server] = _ServerGate(self.per_server, self.interval)
+            return gate
+
+    def query(self, server, text):
+        server = server.lower()
+        address, port = self.overrides.get(server, (server, WHOIS_PORT))
+        gate = self._gate(server)
+        if not text.isascii():
+            text = text.encode("idna").decode("ascii")
+        request = QUERY_FORMATS.get(server, "{}").format(text)
+        for attempt in range(2):
+            with gate.slots:
+                gate.wait_turn()
+                metrics.incr("whois.queries")
+                with socket.create_connection((address, port), timeout=self.timeout) as sock:
+                    sock.sendall(request.encode("ascii") + b"\r\n")
+                    chunks = []
+                    size = 0
+                    while size < MAX_RESPONSE:
+                        chunk = sock.recv(65536)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        size += len(chunk)
+            reply = b"".join(chunks).decode("utf-8", "replace")
+            if attempt == 0 and _THROTTLED.search(reply) and len(reply) < 2048:
+                logging.warning(f"WHOIS server {server} is rate limiting; slowing down")
+                metrics.incr("whois.throttled")
+                gate.back_off()
+                continue
+            return reply
+        return reply
+
+    def tld_server(self, tld):
+        # One IANA lookup per TLD, however many lookups need it at once
+        tld = tld.lower()
+        if tld in self.tld_servers:
+            return self.tld_servers[tld]
+        with self._lock:
+            lock = self._tld_locks.setdefault(tld, threading.Lock())
+        with lock:
+            if tld not in self.tld_servers:
+                match = _REFER.search(self.query(self.iana_server, tld))
+                self.tld_servers[tld] = match.group(1).lower() if match else None
+                logging.info(f"WHOIS server for .{tld}: {self.tld_servers[tld]}")
+        return self.tld_servers[tld]
+
+    def lookup(self, domain):
+        # Returns a WhoisRecord, or None when no registry knows the name
+        # Failures are remembered too, so a batch prefetch is not retried
+        domain = domain.lower().rstrip(".")
+        with self._lock:
+            result = self._results.get(domain, self)
+        if result is self:
+            try:
+                result = self._lookup(domain)
+            except Exception as e:
+                result = e
+            with self._lock:
+                self._results[domain] = result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _lookup(self, domain):
+        try:
+            ipaddress.ip_address(domain)
+        except ValueError:
+            pass
+        else:
+            raise ValueError(f"WHOIS lookups need a domain name, not an address: {domain}")
+        labels = domain.split(".")
+        if len(labels) < 2:
+            raise ValueError(f"Not a domain name: {domain}")
+        server = self.tld_server(labels[-1])
+        if server is None:
+            raise LookupError(f"No WHOIS server known for .{labels[-1]}")
+
+        # Subdomains are unknown to the registry; walk up to the registered name
+        reply = None
+        for start in range(len(labels) - 1):
+            name = ".".join(labels[start:])
+            reply = self.query(server, name)
+            if not _NOT_FOUND.search(reply):
+                break
+        else:
+            return None
+
+        servers = [server]
+        texts = [reply]
+        referral = WhoisRecord(reply)["whois_server"]
+        if referral:
+            referral = re.sub(r"^\w+://", "", referral).strip("/").lower()
+        if referral and referral != server:
+            try:
+                # The registrar's record is the detailed one; it is read first
+                texts.insert(0, self.query(referral, name))
+                servers.insert(0, referral)
+            except OSError as e:
+                logging.warning(f"WHOIS referral to {referral} for {name} failed: {e}")
+        return WhoisRecord("\n".join(texts), servers)
+
+    def lookup_many(self, domains, workers=DEFAULT_WORKERS):
+        # {domain: WhoisRecord | None | Exception}; the per-server gates keep
+        # the fan-out polite however many workers run
+        def attempt(domain):
+            try:
+                return self.lookup(domain)
+            except Exception as e:
+                return e
+
+        domains = list(dict.fromkeys(domains))
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(domains) or 1))) as executor:
+            return dict(zip(domains, executor.map(attempt, domains)))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WhoisClient()
+        return _client
+
+
+def configure_client(**options):
+    # Replaces the shared client, e.g. to point it at a stand-in server
+    global _client
+    with _client_lock:
+        _client = WhoisClient(**options)
+        return _client
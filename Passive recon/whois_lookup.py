@@ -1,18 +1,38 @@
 # whois_lookup.py
 
-import whois
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+from passive.result_cache import cached
+from passive.whois_client import DEFAULT_WORKERS, get_client
+
+@cached("whois", is_failure=lambda info: info is None)
 def get_whois_info(domain, verbose=False):
     try:
-        domain_info = whois.whois(domain)
+        record = get_client().lookup(domain)
+        if record is None:
+            logging.warning(f"WHOIS: no registry has a record for {domain}")
+            return None
         if verbose:
-            logging.info("WHOIS lookup successful.")
-        return domain_info
+            logging.info(f"WHOIS lookup successful (via {', '.join(record.servers)}).")
+        return record.as_dict()
     except Exception as e:
         logging.error(f"WHOIS lookup failed: {e}")
         return None
 
+def prefetch_whois(domains, workers=DEFAULT_WORKERS):
+    # Batch mode: look every target up concurrently up front, through the
+    # result cache, so cached targets cost no query and each target's WHOIS
+    # stage finds its answer already cached (or in the client's memo)
+    domains = list(dict.fromkeys(domains))
+    if not domains:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(domains))) as executor:
+        results = dict(zip(domains, executor.map(get_whois_info, domains)))
+    found = sum(1 for info in results.values() if info)
+    logging.info(f"WHOIS prefetch: {found} of {len(results)} lookups answered")
+    return results
+
 def print_whois_info(domain_info):
     print("\n====== WHOIS INFORMATION ======\n")
     for key, value in domain_info.items():
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from report.models import ReconResult
+
+HISTORY_PATH = os.path.join("reports", "history.sqlite")
+
+
+class HistoryStore:
+    # Every finished target run, indexed by target and time, so scheduled
+    # runs can be compared with the previous one instead of by eye
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                result TEXT NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_target ON runs (target, id)")
+        self._db.commit()
+
+    def record(self, result):
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO runs (target, timestamp, result) VALUES (?, ?, ?)",
+                (result.domain, result.timestamp, json.dumps(result.to_dict(), default=str)),
+            )
+            self._db.commit()
+        return cursor.lastrowid
+
+    def latest(self, target):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM runs WHERE target = ? ORDER BY id DESC LIMIT 1", (target,)
+            ).fetchone()
+        return ReconResult.from_dict(json.loads(row[0])) if row else None
+
+    def latest_port_scan(self, target):
+        # Most recent run with a successful port scan; runs of other modules
+        # in between are skipped
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result FROM runs WHERE target = ? ORDER BY id DESC", (target,)
+            ).fetchall()
+        for (row,) in rows:
+            result = ReconResult.from_dict(json.loads(row))
+            if result.ports is not None and not result.ports.error:
+                return result
+        return None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_history(path=HISTORY_PATH):
+    try:
+        return HistoryStore(path)
+    except sqlite3.Error as e:
+        logging.warning(f"Scan history disabled, could not open {path}: {e}")
+        return None
+
+
+def _added_removed(old, new):
+    old, new = set(old), set(new)
+    return {"added": sorted(new - old), "removed": sorted(old - new)}
+
+
+def diff_results(previous, current):
+    # Only sections both runs collected are compared; a module skipped in
+    # either run reports nothing rather than everything as new/removed
+    changes = {}
+    if previous.subdomains is not None and current.subdomains is not None:
+        changes["subdomains"] = _added_removed(previous.subdomains, current.subdomains)
+    if previous.ports and current.ports and not previous.ports.error and not current.ports.error:
+        ports = _added_removed(previous.ports.open_ports, current.ports.open_ports)
+        changes["ports"] = {"opened": ports["added"], "closed": ports["removed"]}
+    if previous.banners is not None and current.banners is not None:
+        changes["banners"] = {
+            port: {"old": previous.banners[port], "new": banner}
+            for port, banner in current.banners.items()
+            if port in previous.banners and previous.banners[port] != banner
+        }
+    if previous.dns is not None and current.dns is not None:
+        old = {record_set.rtype: record_set.records for record_set in previous.dns}
+        changes["dns"] = {}
+        for record_set in current.dns:
+            if record_set.rtype in old:
+                change = _added_removed(old[record_set.rtype], record_set.records)
+                if change["added"] or change["removed"]:
+                    changes["dns"][record_set.rtype] = change
+    if previous.tech and current.tech and not previous.tech.error and not current.tech.error:
+        changes["tech"] = _added_removed(previous.tech.technologies, current.tech.technologies)
+    if previous.resolved_ip != current.resolved_ip:
+        changes["resolved_ip"] = {"old": previous.resolved_ip, "new": current.resolved_ip}
+    return changes
+
+
+def format_diff(changes):
+    lines = []
+    for name in changes.get("subdomains", {}).get("added", []):
+        lines.append(f"+ subdomain {name}")
+    for name in changes.get("subdomains", {}).get("removed", []):
+        lines.append(f"- subdomain {name}")
+    for port in changes.get("ports", {}).get("opened", []):
+        lines.append(f"+ port {port} opened")
+    for port in changes.get("ports", {}).get("closed", []):
+        lines.append(f"- port {port} closed")
+    for port, banner in changes.get("banners", {}).items():
+        lines.append(f"~ port {port} banner: {banner['old']} -> {banner['new']}")
+    for rtype, change in changes.get("dns", {}).items():
+        lines.extend(f"+ {rtype} {value}" for value in change["added"])
+        lines.extend(f"- {rtype} {value}" for value in change["removed"])
+    for name in changes.get("tech", {}).get("added", []):
+        lines.append(f"+ technology {name}")
+    for name in changes.get("tech", {}).get("removed", []):
+        lines.append(f"- technology {name}")
+    if "resolved_ip" in changes:
+        lines.append(f"~ resolved IP: {changes['resolved_ip']['old']} -> {changes['resolved_ip']['new']}")
+    return lines
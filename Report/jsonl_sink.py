@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+# Records are written once this many are buffered or this many seconds pass,
+# whichever comes first
+BUFFER_RECORDS = 200
+FLUSH_INTERVAL = 2.0
+
+
+class JsonlSink:
+    # Append-only JSON Lines stream of findings, one record per open port,
+    # banner, subdomain, DNS record, technology, ... as each is produced.
+    # A crashed run keeps everything flushed up to that point, and the HTML
+    # report can be rendered from the file afterwards in a single pass.
+    # `observer(record_type)` is told about every record (e.g. a progress line).
+
+    def __init__(self, path, buffer_records=BUFFER_RECORDS, flush_interval=FLUSH_INTERVAL, observer=None):
+        self.path = path
+        self.observer = observer
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        # Quiet stretches (e.g. a long sweep of filtered ports) still get flushed
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def emit(self, record_type, target, **fields):
+        record = {"type": record_type, "target": target, "ts": round(time.time(), 3), **fields}
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._buffer.append(line)
+            self.records += 1
+            if len(self._buffer) >= self.buffer_records:
+                self._write()
+        if self.observer:
+            self.observer(record_type)
+
+    def _write(self):
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._write()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if not self._file.closed:
+                self._write()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(path):
+    # Yields records one at a time; a line cut short by a crash is skipped
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
@@ -0,0 +1,113 @@
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional
+
+# Typed results that every stage writes into directly. A section left at
+# None was skipped; the writers render straight from these objects.
+
+
+@dataclass(slots=True)
+class WhoisResult:
+    fields: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DnsRecordSet:
+    rtype: str
+    records: list = field(default_factory=list)
+    ttl: Optional[int] = None
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PortScanResult:
+    spec: str
+    open_ports: list = field(default_factory=list)
+    timing: Optional[dict] = None
+    error: Optional[str] = None
+    # Rotating slice probed by an --incremental run; None for a full sweep
+    incremental_slice: Optional[int] = None
+
+
+@dataclass(slots=True)
+class TechResult:
+    technologies: list = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class SubdomainHost:
+    address: str
+    names: list = field(default_factory=list)
+    open_ports: list = field(default_factory=list)
+    banners: dict = field(default_factory=dict)
+    technologies: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ReconResult:
+    domain: str
+    url: str
+    timestamp: str = field(default_factory=lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    resolved_ip: str = "Resolution failed"
+    subdomains: Optional[list] = None
+    whois: Optional[WhoisResult] = None
+    dns: Optional[list] = None
+    ports: Optional[PortScanResult] = None
+    banners: Optional[dict] = None
+    tech: Optional[TechResult] = None
+    subdomain_hosts: Optional[list] = None
+    stage_timings: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        # Inverse of to_dict() after a JSON round trip (port keys come back as strings)
+        data = dict(data)
+        if data.get("whois") is not None:
+            data["whois"] = WhoisResult(**data["whois"])
+        if data.get("dns") is not None:
+            data["dns"] = [DnsRecordSet(**record_set) for record_set in data["dns"]]
+        if data.get("ports") is not None:
+            data["ports"] = PortScanResult(**data["ports"])
+        if data.get("banners") is not None:
+            data["banners"] = {int(port): banner for port, banner in data["banners"].items()}
+        if data.get("tech") is not None:
+            data["tech"] = TechResult(**data["tech"])
+        if data.get("subdomain_hosts") is not None:
+            data["subdomain_hosts"] = [
+                SubdomainHost(**{**host, "banners": {int(port): banner for port, banner in host["banners"].items()}})
+                for host in data["subdomain_hosts"]
+            ]
+        return cls(**data)
+
+
+def whois_from_lookup(domain_info):
+    # python-whois returns a dict subclass with datetimes and lists in it
+    if not domain_info:
+        return WhoisResult(error="WHOIS data not found.")
+    fields = {}
+    for key, value in domain_info.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        fields[key] = str(value)
+    return WhoisResult(fields=fields)
+
+
+def dns_from_lookup(records):
+    return [
+        DnsRecordSet(
+            rtype=rtype,
+            records=list(result["records"]),
+            ttl=result["ttl"],
+            error_type=result["error"]["type"] if result["error"] else None,
+            error_message=result["error"]["message"] if result["error"] else None,
+        )
+        for rtype, result in records.items()
+    ]
@@ -1,59 +1,104 @@
 from datetime import datetime
+import html
+import json
 import os
+import shutil
+import tempfile
 
-def save_report(domain, report_data, format="txt"):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+from report.jsonl_sink import iter_records
+
+# Text shown for a section that produced nothing (Subdomain Hosts is only
+# listed when --expand ran)
+_PLACEHOLDERS = {
+    "Subdomain Enumeration": "No subdomains or skipped.",
+    "WHOIS Lookup": "No WHOIS data or skipped.",
+    "DNS Enumeration": "No DNS records or skipped.",
+    "Open Ports": "No open ports or skipped.",
+    "Banner Grabbing": "No banners or skipped.",
+    "Technology Detection": "No technologies or skipped.",
+}
+
+def _file_stamp(result):
+    return datetime.strptime(result.timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y%m%d_%H%M%S")
+
+def report_sections(result):
+    # (title, entries, placeholder) per module, straight from the result model
+    sections = [
+        ("Subdomain Enumeration", result.subdomains or [], _PLACEHOLDERS["Subdomain Enumeration"]),
+        ("WHOIS Lookup",
+         [f"{key}: {value}" for key, value in result.whois.fields.items()] if result.whois else [],
+         result.whois.error if result.whois and result.whois.error else _PLACEHOLDERS["WHOIS Lookup"]),
+        ("DNS Enumeration",
+         [f"{rs.rtype}: {', '.join(rs.records) if rs.records else rs.error_type}" for rs in result.dns or []],
+         _PLACEHOLDERS["DNS Enumeration"]),
+        ("Open Ports",
+         [str(port) for port in result.ports.open_ports] if result.ports else [],
+         result.ports.error if result.ports and result.ports.error else _PLACEHOLDERS["Open Ports"]),
+        ("Banner Grabbing",
+         [f"Port {port}: {banner}" for port, banner in (result.banners or {}).items()],
+         _PLACEHOLDERS["Banner Grabbing"]),
+        ("Technology Detection",
+         list(result.tech.technologies) if result.tech else [],
+         result.tech.error if result.tech and result.tech.error else _PLACEHOLDERS["Technology Detection"]),
+    ]
+    if result.subdomain_hosts is not None:
+        sections.append((
+            "Subdomain Hosts",
+            [f"{host.address} ({', '.join(host.names)}): ports {', '.join(map(str, host.open_ports)) or 'none'}"
+             for host in result.subdomain_hosts],
+            "No subdomain hosts.",
+        ))
+    return sections
+
+def render_text(result):
+    parts = [f"Target Domain: {result.domain}\nResolved IP: {result.resolved_ip}\nTimestamp: {result.timestamp}\n"]
+    for title, entries, placeholder in report_sections(result):
+        parts.append(f"[{title}]\n" + ("\n".join(entries) if entries else placeholder) + "\n")
+    return "\n".join(parts)
+
+def save_report(result, format="txt"):
     os.makedirs("reports", exist_ok=True)
-    filename = f"reports/{domain}_{timestamp}.{format}"
+    filename = f"reports/{result.domain}_{_file_stamp(result)}.{format}"
 
+    if format == "json":
+        content = json.dumps(result.to_dict(), indent=2, default=str)
+    else:
+        content = render_text(result)
     with open(filename, "w", encoding="utf-8") as f:
-        f.write(report_data)
+        f.write(content)
 
     print(f"✅ {format.upper()} report saved to: {filename}")
+    return filename
 
-def generate_html_report(domain, report_data):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    lines = report_data.strip().splitlines()
-
-    if not lines:
-        print("❌ No report data to render.")
-        return
-
-    domain_val, ip_val, time_val = domain, "Unknown", timestamp
-    for line in lines:
-        if line.startswith("Target Domain"):
-            domain_val = line.split(":", 1)[1].strip()
-        elif line.startswith("Resolved IP"):
-            ip_val = line.split(":", 1)[1].strip()
-        elif line.startswith("Timestamp"):
-            time_val = line.split(":", 1)[1].strip()
-
-    html_sections = ""
-    current_title = None
-    current_content = []
-    parsed_data = {}
-
-    for line in lines:
-        if line.strip().startswith("[") and line.strip().endswith("]"):
-            if current_title:
-                html_sections += _wrap_collapsible(current_title, "\n".join(current_content))
-                parsed_data[current_title] = current_content.copy()
-            current_title = line.strip("= []").strip()
-            current_content = []
-        elif current_title:
-            current_content.append(line)
-
-    if current_title:
-        html_sections += _wrap_collapsible(current_title, "\n".join(current_content))
-        parsed_data[current_title] = current_content.copy()
-
-    chart_script = _generate_chart_script(parsed_data)
-
-    html_content = f"""<!DOCTYPE html>
+def save_diff(result, changes):
+    os.makedirs("reports", exist_ok=True)
+    filename = f"reports/{result.domain}_{_file_stamp(result)}.diff.json"
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(changes, f, indent=2, default=str)
+
+    print(f"✅ Diff saved to: {filename}")
+    return filename
+
+# JSONL record type -> (section, line rendered for that record)
+_RECORD_SECTIONS = {
+    "subdomain": ("Subdomain Enumeration", lambda r: r["name"]),
+    "whois": ("WHOIS Lookup", lambda r: f"{r['field']}: {r['value']}"),
+    "dns": ("DNS Enumeration", lambda r: f"{r['rtype']}: {r['value'] if r.get('value') is not None else r['error']}"),
+    "open_port": ("Open Ports", lambda r: str(r["port"])),
+    "banner": ("Banner Grabbing", lambda r: f"Port {r['port']}: {r['banner']}"),
+    "tech": ("Technology Detection", lambda r: r["name"]),
+    "subdomain_host": ("Subdomain Hosts",
+                       lambda r: f"{r['address']} ({', '.join(r['names'])}): "
+                                 f"ports {', '.join(map(str, r['open_ports'])) or 'none'}"),
+}
+# A target's sections are held in memory up to this size, then spill to disk
+SPOOL_SIZE = 256 * 1024
+
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
-    <title>Recon Report for {domain_val}</title>
+    <title>Recon Report for {title}</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <style>
         body {{
@@ -118,9 +163,7 @@ def generate_html_report(domain, report_data):
     <div class="container">
         <h1>Reconnaissance Report</h1>
         <div class="meta">
-            <p><b>Target Domain:</b> {domain_val}</p>
-            <p><b>Resolved IP:</b> {ip_val}</p>
-            <p><b>Generated:</b> {time_val}</p>
+            <p><b>Generated:</b> {generated}</p>
         </div>
         <div class="charts-container">
             <div class="chart-box">
@@ -129,32 +172,104 @@ def generate_html_report(domain, report_data):
                 <canvas id="chart" width="600" height="300"></canvas>
             </div>
         </div>
-        {html_sections or "<p>No results available.</p>"}
-    </div>
+"""
+
+_HTML_TAIL = """    </div>
     <script>{chart_script}</script>
 </body>
 </html>"""
 
-    filename = f"reports/{domain}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html_content)
+def render_html_report(jsonl_path, filename=None, title=None):
+    # Builds the HTML report from a findings stream in one pass. Records are
+    # grouped per target in file order; only the current target's sections
+    # are held (spooled) at a time, so memory stays flat for any batch size.
+    filename = filename or os.path.splitext(jsonl_path)[0] + ".html"
+    title = title or os.path.splitext(os.path.basename(jsonl_path))[0]
+    module_counts = dict.fromkeys((section for section, _ in _RECORD_SECTIONS.values()), 0)
+    partial = filename + ".partial"
+
+    with open(partial, "w", encoding="utf-8") as out:
+        out.write(_HTML_HEAD.format(title=html.escape(title),
+                                    generated=html.escape(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))))
+        current = None
+        targets = 0
+        # Findings streamed before their target's record (the shared batch
+        # port sweep runs ahead of the per-target stages), held until it starts
+        early = {}
+        try:
+            for record in iter_records(jsonl_path):
+                if record["type"] == "target":
+                    if current and current["meta"]["target"] == record["target"]:
+                        # A resumed run picks the same target up again
+                        continue
+                    if current:
+                        _write_target(out, current)
+                    current = {"meta": record, "resolved_ip": "Resolution failed", "sections": {}, "errors": {}}
+                    targets += 1
+                    for held in early.pop(record["target"], ()):
+                        _add_record(current, held, module_counts)
+                    continue
+                if current is None or record.get("target") != current["meta"]["target"]:
+                    early.setdefault(record.get("target"), []).append(record)
+                    continue
+                _add_record(current, record, module_counts)
+            if current:
+                _write_target(out, current)
+        finally:
+            if current:
+                for spool in current["sections"].values():
+                    spool.close()
+        if not targets:
+            out.write("        <p>No results available.</p>\n")
+        out.write(_HTML_TAIL.format(chart_script=_generate_chart_script(module_counts)))
+    os.replace(partial, filename)
 
     print(f"✅ HTML report saved to: {filename}")
+    return filename
 
-def _wrap_collapsible(title, content):
-    return f"""
+def _add_record(current, record, module_counts):
+    if record["type"] == "resolved_ip":
+        current["resolved_ip"] = record["address"]
+    elif record["type"] == "error":
+        current["errors"][record["section"]] = record["message"]
+    elif record["type"] in _RECORD_SECTIONS:
+        section, render = _RECORD_SECTIONS[record["type"]]
+        spool = current["sections"].get(section)
+        if spool is None:
+            spool = current["sections"][section] = tempfile.SpooledTemporaryFile(
+                max_size=SPOOL_SIZE, mode="w+", encoding="utf-8")
+        spool.write(html.escape(render(record)) + "\n")
+        module_counts[section] += 1
+
+def _write_target(out, target):
+    meta = target["meta"]
+    out.write(f"""        <h2>{html.escape(meta["target"])}</h2>
+        <div class="meta">
+            <p><b>Resolved IP:</b> {html.escape(str(target["resolved_ip"]))}</p>
+            <p><b>Timestamp:</b> {html.escape(meta["timestamp"])}</p>
+        </div>
+""")
+    for section in dict.fromkeys(section for section, _ in _RECORD_SECTIONS.values()):
+        spool = target["sections"].pop(section, None)
+        if spool is None and section not in _PLACEHOLDERS and section not in target["errors"]:
+            continue
+        out.write(f"""
 <details>
-    <summary>{title}</summary>
-    <pre>{content}</pre>
+    <summary>{html.escape(section)}</summary>
+    <pre>""")
+        if spool is None:
+            out.write(html.escape(target["errors"].get(section) or _PLACEHOLDERS.get(section, "")))
+        else:
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+            spool.close()
+        out.write("""</pre>
 </details>
-"""
-
-def _generate_chart_script(parsed_data):
-    module_counts = {
-        section: len([line for line in lines if line.strip()])
-        for section, lines in parsed_data.items()
-    }
+""")
 
+def _generate_chart_script(module_counts):
+    module_counts = {section: count for section, count in module_counts.items()
+                     if count or section in _PLACEHOLDERS}
     labels = list(module_counts.keys())
     values = list(module_counts.values())
 
@@ -163,7 +278,7 @@ const ctx = document.getElementById('chart').getContext('2d');
 new Chart(ctx, {{
     type: 'bar',
     data: {{
-        labels: {labels},
+        labels: {json.dumps(labels)},
         datasets: [{{
             label: 'Module Entries',
             data: {values},
@@ -185,3 +300,8 @@ new Chart(ctx, {{
     }}
 }});
 """
+
+if __name__ == "__main__":
+    # Re-render the HTML report from a findings file, e.g. after a crash
+    import sys
+    render_html_report(sys.argv[1])
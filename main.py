@@ -1,182 +1,524 @@
+import contextlib
+import importlib
 import os
 import logging
-from passive.dns_enum import get_dns_records
-from active.banner_grabber import grab_banner
-from active.port_scanner import socket_scan
-from active.tech_detect import detect_with_wappalyzer
-from passive.subdomain_enum import enumerate_subdomains  
-from passive.whois_lookup import get_whois_info, print_whois_info
+import socket
+import sys
+from datetime import datetime
+from active.port_scanner import DEFAULT_CONCURRENCY, make_scanner, scan_hosts
+from active.port_spec import port_slice
+from passive.result_cache import configure_cache
 from cli.cli_handler import handle_cli
-from report.report_writer import save_report, generate_html_report
+from core.checkpoint import Checkpoint
+from core.logging_setup import setup_logging
+from core.metrics import metrics
+from core.progress import Progress
+from core.pipeline import Pipeline, Stage, Stream
+from report.models import (PortScanResult, ReconResult, SubdomainHost, TechResult, WhoisResult,
+                           dns_from_lookup, whois_from_lookup)
+from report.jsonl_sink import JsonlSink
+from report.history import diff_results, format_diff, open_history
+from report.report_writer import render_html_report, save_diff, save_report
 
-# === Logging Setup ===
-if not os.path.exists("logs"):
-    os.makedirs("logs")
+# === Lazy Module Registry ===
+# flag -> module implementing it. Modules are imported on first use, so a
+# run only loads the dependencies (requests, dnspython, Wappalyzer)
+# of the flags it was given, and --help loads none of them.
+MODULES = {
+    "dns": "passive.dns_enum",
+    "subdomains": "passive.subdomain_enum",
+    "expand": "passive.bulk_resolve",
+    "whois": "passive.whois_lookup",
+    "banner": "active.banner_grabber",
+    "tech": "active.tech_detect",
+}
 
-logging.basicConfig(
-    filename="logs/tool.log",
-    filemode="a",
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+def load(flag):
+    return importlib.import_module(MODULES[flag])
+
+def resolver(args):
+    # The caching resolver needs dnspython; runs that don't query DNS
+    # anyway use the system resolver instead of importing it
+    if args.dns or args.subdomains:
+        return load("dns").resolve_host
+    return socket.gethostbyname
+
+def scan_subdomain_hosts(args, domain, subdomains, sink):
+    # Resolve discovered names in bulk and run the active modules once per
+    # unique live address instead of once per name
+    resolution = load("expand").resolve_subdomains(subdomains)
+    hosts = resolution["hosts"]
+    print(f"Resolved {len(subdomains)} names to {len(hosts)} unique addresses "
+          f"({len(resolution['wildcard'])} wildcard, {len(resolution['unresolved'])} unresolved)")
+    logging.info(f"Subdomain resolution for {domain}: {len(hosts)} unique hosts, "
+                 f"{len(resolution['wildcard'])} wildcard, {len(resolution['unresolved'])} unresolved")
+
+    results = [SubdomainHost(address=ip, names=sorted(names)) for ip, names in sorted(hosts.items())]
+    if args.ports and results:
+        scans = scan_hosts([host.address for host in results], args.port_set, backend=args.scan_backend,
+                           workers=args.workers)
+        for host in results:
+            host.open_ports = scans[host.address]["open_ports"]
+
+    for host in results:
+        name = host.names[0]
+        print(f"\n[{host.address}] {', '.join(host.names)}")
+        for port in host.open_ports:
+            print(f"- Port {port}")
+        if args.banner and host.open_ports:
+            host.banners = load("banner").grab_banner(host.address, host.open_ports, hostname=name)
+            for port, banner in host.banners.items():
+                print(f"  [Port {port}] {banner}")
+        if args.tech:
+            tech = load("tech").detect_with_wappalyzer(
+                f"http://{name}", response=load("banner").get_cached_response(f"http://{name}"))
+            if isinstance(tech, set):
+                host.technologies = sorted(tech)
+                print(f"  Technologies: {', '.join(host.technologies) or 'none'}")
+        sink.emit("subdomain_host", domain, address=host.address, names=host.names,
+                  open_ports=host.open_ports, banners=host.banners, technologies=host.technologies)
+    return results
 
 def main():
     args = handle_cli()
-    domain = args.domain
-    url = f"{args.scheme}://{domain}"
+    setup_logging()
+    configure_cache(enabled=not args.no_cache)
 
-    # === SUBDOMAIN ENUMERATION ===
-    if args.subdomains:
-        print("\n====== SUBDOMAIN ENUMERATION RESULTS ======\n")
-        try:
-            logging.info(f"Starting subdomain enumeration for {domain}")
-            subdomains = enumerate_subdomains(domain, verbose=True)
-            if subdomains:
-                print(f"\nTotal Subdomains Found: {len(subdomains)}\n")
-                for sub in subdomains:
-                    print(f"- {sub}")
-                logging.info(f"Subdomains found for {domain}: {len(subdomains)}")
-            else:
-                print("No subdomains found.")
-                logging.info(f"No subdomains found for {domain}")
-        except Exception as e:
-            print(f"Error in Subdomain Enumeration: {e}")
-            logging.error(f"Subdomain Enumeration Error: {e}")
+    # Progress is checkpointed throughout; --resume picks up the same job
+    checkpoint = Checkpoint.open(args, resume=args.resume)
+    history = open_history()
+    if args.resume:
+        print("Resuming from checkpoint." if checkpoint.resumed else "No checkpoint found; starting from scratch.")
 
-    # === WHOIS LOOKUP ===
-    if args.whois:
-        print("\n====== WHOIS LOOKUP ======\n")
-        try:
-            logging.info(f"Starting WHOIS lookup for {domain}")
-            whois_data = get_whois_info(domain, verbose=True)
-            if whois_data:
-                print_whois_info(whois_data)
-                logging.info(f"WHOIS data retrieved for {domain}")
+    # Findings are streamed to disk as they are found; the HTML report is
+    # rendered from that file once the run completes
+    name = "batch" if args.batch else args.domain
+    findings = checkpoint.findings
+    if not findings or not os.path.exists(findings):
+        findings = checkpoint.findings = f"reports/{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    # --quiet: per-finding output is dropped and findings only tick a status line
+    progress = Progress(total_targets=len(args.target_list)) if args.quiet else None
+    output = open(os.devnull, "w") if args.quiet else contextlib.nullcontext(sys.stdout)
+    profiler = None
+    if args.profile:
+        # Imported only here: cProfile stays out of normal startup
+        from core.profiling import RunProfiler
+        profiler = RunProfiler()
+    try:
+        if profiler:
+            profiler.start()
+        with JsonlSink(findings, observer=progress.record if progress else None) as sink, \
+                output as out, contextlib.redirect_stdout(out):
+            if args.batch:
+                run_batch(args, sink, checkpoint, history)
             else:
-                print("WHOIS data not found.")
-                logging.warning(f"No WHOIS data found for {domain}")
-        except Exception as e:
-            print(f"Error in WHOIS Lookup: {e}")
-            logging.error(f"WHOIS Lookup Error: {e}")
+                run_target(args, args.domain, args.scheme, sink, checkpoint, history)
+    finally:
+        if profiler:
+            profiler.stop()
+        if progress:
+            progress.close()
+        checkpoint.save()
+    checkpoint.remove()
+    print(f"✅ Findings streamed to: {findings}")
+    render_html_report(findings, title=name)
 
-    # === DNS ENUMERATION ===
-    if args.dns:
-        print("\n====== DNS ENUMERATION RESULTS ======\n")
-        try:
-            logging.info(f"Starting DNS enumeration for {domain}")
-            dns_results = get_dns_records(domain)
-            for record_type, values in dns_results.items():
-                print(f"{record_type} Records:")
-                for value in values:
-                    print(f"- {value}")
-                print()
-            logging.info(f"DNS records for {domain}: {dns_results}")
-        except Exception as e:
-            print(f"Error in DNS Enumeration: {e}")
-            logging.error(f"DNS Enumeration Error: {e}")
+    # === Metrics & Profile ===
+    stem = os.path.splitext(findings)[0]
+    print("\n====== METRICS ======\n")
+    print(metrics.summary())
+    logging.info(f"Metrics: {metrics.rates()}")
+    print(f"✅ Metrics saved to: {metrics.export(stem + '.metrics.json')}")
+    if profiler:
+        save_profile(profiler, stem)
 
-    # === PORT SCANNING ===
-    open_ports = []
-    if args.ports:
-        print("\n====== FULL PORT SCAN (1-65535) ======\n")
-        try:
-            logging.info(f"Starting full port scan on {domain}")
-            open_ports = socket_scan(domain)
-            if open_ports:
-                print("\nOpen Ports:")
-                for port in open_ports:
-                    print(f"- Port {port}")
-                logging.info(f"Open ports on {domain}: {open_ports}")
-            else:
-                print("No open ports found.")
-                logging.info(f"No open ports found on {domain}")
-        except Exception as e:
-            print(f"Error in Port Scanning: {e}")
-            logging.error(f"Port Scanning Error: {e}")
+def save_profile(profiler, stem):
+    # Raw stats for snakeviz/pstats plus a readable top-40 by cumulative time
+    import io
+    text = io.StringIO()
+    stats = profiler.stats(stream=text)
+    stats.dump_stats(stem + ".prof")
+    stats.sort_stats("cumulative").print_stats(40)
+    with open(stem + ".profile.txt", "w", encoding="utf-8") as f:
+        f.write(text.getvalue())
+    print(f"✅ Profile saved to: {stem}.prof ({stem}.profile.txt)")
+
+def plan_ports(args, history, domain):
+    # Incremental runs probe what was open last time plus a rotating slice
+    # of the rest; the first run of a target is always a full sweep.
+    # Returns (ports, slice index or None for a full sweep). The index
+    # advances per incremental port run only, so `slices` of them cover
+    # the whole range whatever else runs in between.
+    if not args.incremental or history is None:
+        return args.port_set, None
+    previous = history.latest_port_scan(domain)
+    if previous is None:
+        return args.port_set, None
+    slices = max(1, round(1 / args.incremental))
+    last = previous.ports.incremental_slice
+    index = (last + 1) % slices if last is not None else 0
+    ports = port_slice(args.port_set, slices, index)
+    for port in previous.ports.open_ports:
+        if port in args.port_set:
+            ports.add(port)
+    return ports, index
 
-    # === BANNER GRABBING ===
-    if args.banner and open_ports:
-        print("\n====== BANNER GRABBING RESULTS ======\n")
+def run_batch(args, sink, checkpoint, history):
+    # === BATCH MODE ===
+    # All hosts share one port-scan scheduler; the other modules run per target
+    scan_results = {}
+    hosts = list(dict.fromkeys(domain for domain, _ in args.target_list))
+    print(f"\n====== BATCH MODE: {len(hosts)} targets ======\n")
+    pending = [host for host in hosts if not checkpoint.target_finished(host)]
+    if len(pending) < len(hosts):
+        print(f"{len(hosts) - len(pending)} targets already finished; {len(pending)} left")
+    if args.ports and pending:
         try:
-            logging.info(f"Starting banner grabbing on {domain}")
-            banner_results = grab_banner(domain, open_ports)
-            for port, banner in banner_results.items():
-                print(f"[Port {port}] {banner}")
-            logging.info(f"Banners grabbed: {banner_results}")
+            logging.info(f"Starting batch port scan on {len(pending)} hosts")
+            # Ports left out of an incremental plan are skipped like already-scanned ones
+            skip = {host: checkpoint.scanned_ports(host) | (args.port_set - plan_ports(args, history, host)[0])
+                    for host in pending}
+            # Open ports go to the findings stream as the shared sweep finds
+            # them, so a crash mid-batch keeps everything found so far
+            def port_done(host, port, is_open):
+                checkpoint.port_done(host, port, is_open)
+                if is_open:
+                    sink.emit("open_port", host, port=port)
+
+            scan_results = scan_hosts(pending, args.port_set, resolve=resolver(args), on_done=port_done,
+                                      skip=skip, backend=args.scan_backend, workers=args.workers)
+            # Ports found open before an interruption are not probed again
+            for host, scan in scan_results.items():
+                if "error" not in scan:
+                    scan["open_ports"] = sorted(set(scan["open_ports"]) | set(checkpoint.open_ports(host)))
+            logging.info(f"Batch port scan finished for {len(pending)} hosts")
         except Exception as e:
-            print(f"Error in Banner Grabbing: {e}")
-            logging.error(f"Banner Grabbing Error: {e}")
-    elif args.banner:
-        print("\nSkipping Banner Grabbing (no open ports found).")
-        logging.warning(f"Banner grabbing skipped: no open ports found on {domain}")
+            print(f"Error in Batch Port Scanning: {e}")
+            logging.error(f"Batch Port Scanning Error: {e}")
 
-    # === TECHNOLOGY DETECTION ===
-    if args.tech:
-        print("\n====== TECHNOLOGY DETECTION (Wappalyzer) ======\n")
+    if args.whois and pending:
+        # WHOIS is the slow passive lookup; run all targets' at once up front
         try:
-            logging.info(f"Starting technology detection on {url}")
-            tech_result = detect_with_wappalyzer(url)
-            if isinstance(tech_result, set):
-                print("Detected Technologies:")
-                for tech in tech_result:
-                    print(f"- {tech}")
-                logging.info(f"Technologies detected on {url}: {list(tech_result)}")
-            elif isinstance(tech_result, dict) and "error" in tech_result:
-                print(tech_result["error"])
-                logging.warning(f"Technology detection error on {url}: {tech_result['error']}")
-            else:
-                print("No technologies detected or unexpected result.")
-                logging.info(f"No technologies detected on {url}")
+            logging.info(f"Prefetching WHOIS for {len(pending)} targets")
+            load("whois").prefetch_whois(pending)
         except Exception as e:
-            print(f"Error in Technology Detection: {e}")
-            logging.error(f"Technology Detection Error: {e}")
+            logging.error(f"WHOIS Prefetch Error: {e}")
+
+    for domain, scheme in args.target_list:
+        print(f"\n################ {scheme}://{domain} ################")
+        if checkpoint.target_finished(domain):
+            continue
+        run_target(args, domain, scheme, sink, checkpoint, history, scan_results.get(domain))
 
+# === Stages ===
+# Each stage reads its inputs from the context and returns its outputs; the
+# pipeline starts a stage as soon as everything it requires is available.
+# Every stage also records its section on the shared ReconResult.
 
-    # === Report Compilation ===
-    from datetime import datetime
-    import socket
+def stage_subdomains(ctx):
+    domain = ctx["domain"]
+    subdomains = []
+    print("\n====== SUBDOMAIN ENUMERATION RESULTS ======\n")
+    try:
+        logging.info(f"Starting subdomain enumeration for {domain}")
+        subdomains = load("subdomains").enumerate_subdomains(domain, verbose=True)
+        if subdomains:
+            print(f"\nTotal Subdomains Found: {len(subdomains)}\n")
+            for sub in subdomains:
+                print(f"- {sub}")
+                ctx["sink"].emit("subdomain", domain, name=sub)
+            logging.info(f"Subdomains found for {domain}: {len(subdomains)}")
+        else:
+            print("No subdomains found.")
+            logging.info(f"No subdomains found for {domain}")
+    except Exception as e:
+        print(f"Error in Subdomain Enumeration: {e}")
+        logging.error(f"Subdomain Enumeration Error: {e}")
+    ctx["result"].subdomains = subdomains
+    return {"subdomains": subdomains}
+
+def stage_whois(ctx):
+    domain = ctx["domain"]
+    whois_data = None
+    print("\n====== WHOIS LOOKUP ======\n")
+    try:
+        logging.info(f"Starting WHOIS lookup for {domain}")
+        whois = load("whois")
+        whois_data = whois.get_whois_info(domain, verbose=True)
+        if whois_data:
+            whois.print_whois_info(whois_data)
+            logging.info(f"WHOIS data retrieved for {domain}")
+        else:
+            print("WHOIS data not found.")
+            logging.warning(f"No WHOIS data found for {domain}")
+        ctx["result"].whois = whois_from_lookup(whois_data)
+        for field, value in ctx["result"].whois.fields.items():
+            ctx["sink"].emit("whois", domain, field=field, value=value)
+    except Exception as e:
+        print(f"Error in WHOIS Lookup: {e}")
+        logging.error(f"WHOIS Lookup Error: {e}")
+        ctx["result"].whois = WhoisResult(error=str(e))
+        ctx["sink"].emit("error", domain, section="WHOIS Lookup", message=str(e))
+    return {"whois": whois_data}
 
-    # Ensure variables are defined even if flags are not passed
-    subdomains = subdomains if args.subdomains and 'subdomains' in locals() else []
-    whois_data = whois_data if args.whois and 'whois_data' in locals() else "No WHOIS data or skipped."
-    dns_results = dns_results if args.dns and 'dns_results' in locals() else {}
-    banner_results = banner_results if args.banner and 'banner_results' in locals() else {}
-    tech_result = tech_result if args.tech and 'tech_result' in locals() else set()
+def stage_dns(ctx):
+    domain = ctx["domain"]
+    dns_results = {}
+    print("\n====== DNS ENUMERATION RESULTS ======\n")
+    try:
+        logging.info(f"Starting DNS enumeration for {domain}")
+        dns_results = load("dns").get_dns_records(domain)
+        for record_type, result in dns_results.items():
+            print(f"{record_type} Records:")
+            for value in result["records"]:
+                print(f"- {value}")
+                ctx["sink"].emit("dns", domain, rtype=record_type, value=value, ttl=result["ttl"])
+            if result["error"]:
+                print(f"- (none: {result['error']['type']})")
+                ctx["sink"].emit("dns", domain, rtype=record_type, value=None, error=result["error"]["type"])
+            print()
+        found = sum(len(result["records"]) for result in dns_results.values())
+        logging.info(f"DNS records for {domain}: {found} across {len(dns_results)} types")
+    except Exception as e:
+        print(f"Error in DNS Enumeration: {e}")
+        logging.error(f"DNS Enumeration Error: {e}")
+    ctx["result"].dns = dns_from_lookup(dns_results)
+    return {"dns": dns_results}
 
+def stage_resolve(ctx):
     try:
-        resolved_ip = socket.gethostbyname(domain)
+        resolved_ip = resolver(ctx["args"])(ctx["domain"])
     except Exception:
         resolved_ip = "Resolution failed"
+    ctx["result"].resolved_ip = resolved_ip
+    ctx["sink"].emit("resolved_ip", ctx["domain"], address=resolved_ip)
+    return {"resolved_ip": resolved_ip}
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+def stage_ports(ctx):
+    args, domain, scan_result, sink = ctx["args"], ctx["domain"], ctx["scan_result"], ctx["sink"]
+    checkpoint, port_set = ctx["checkpoint"], ctx["port_set"]
+    open_ports = []
+    timing = error = None
+    # Open ports are streamed to the banner stage while the sweep continues
+    stream = Stream()
+    ctx.publish("open_port_stream", stream)
+    spec = args.ports if port_set is args.port_set else f"{args.ports} (incremental)"
+    print(f"\n====== PORT SCAN ({len(port_set)} ports: {spec}) ======\n")
+    try:
+        logging.info(f"Starting port scan on {domain} ({len(port_set)} ports: {spec})")
+        if scan_result is None:
+            scanner = make_scanner(args.scan_backend, concurrency=DEFAULT_CONCURRENCY, resolve=resolver(args),
+                                   on_done=checkpoint.port_done, workers=args.workers)
+            # Ports settled before an interruption are skipped; the open ones are replayed
+            for port in checkpoint.open_ports(domain):
+                open_ports.append(port)
+                stream.put(port)
+            for port in scanner.scan(domain, port_set, skip=checkpoint.scanned_ports(domain)):
+                open_ports.append(port)
+                stream.put(port)
+                sink.emit("open_port", domain, port=port)
+            # Unresolvable targets never get a timing entry
+            if domain in scanner.errors:
+                raise OSError(f"Could not resolve {domain}: {scanner.errors[domain]}")
+            timing = scanner.timing[domain].as_dict()
+            if timing is None:
+                raise OSError(f"Port scan of {domain} produced no results")
+            scan_result = {"open_ports": sorted(open_ports), "timing": timing}
+        elif "error" in scan_result:
+            raise OSError(scan_result["error"])
+        else:
+            # Batch sweep: its open ports were streamed as they were found
+            for port in scan_result["open_ports"]:
+                stream.put(port)
+        open_ports = scan_result["open_ports"]
+        timing = scan_result["timing"]
+        # SYN scans are stateless and report no RTT
+        rtt = f"{timing['rtt']}s" if timing["rtt"] is not None else "n/a"
+        print(f"Scan timing: RTT={rtt} timeout={timing['timeout']}s "
+              f"rate={timing['rate']} probes/s ({timing['timeouts']} timeouts)")
+        logging.info(f"Port scan timing for {domain}: rtt={timing['rtt']}s rate={timing['rate']}/s "
+                     f"timeouts={timing['timeouts']}")
+        sink.emit("port_scan", domain, spec=spec, timing=timing)
+        if open_ports:
+            print("\nOpen Ports:")
+            for port in open_ports:
+                print(f"- Port {port}")
+            logging.info(f"Open ports on {domain}: {len(open_ports)}")
+        else:
+            print("No open ports found.")
+            logging.info(f"No open ports found on {domain}")
+    except Exception as e:
+        error = str(e)
+        sink.emit("error", domain, section="Open Ports", message=error)
+        print(f"Error in Port Scanning: {e}")
+        logging.error(f"Port Scanning Error: {e}")
+    finally:
+        stream.close()
+    ctx["result"].ports = PortScanResult(spec=spec, open_ports=sorted(open_ports), timing=timing, error=error,
+                                         incremental_slice=ctx["port_slice"])
+    return {"open_ports": sorted(open_ports)}
 
-    report_data = f"""Target Domain: {domain}
-Resolved IP: {resolved_ip}
-Timestamp: {timestamp}
+def stage_banners(ctx):
+    domain = ctx["domain"]
+    banner_results = {}
+    print("\n====== BANNER GRABBING RESULTS (streamed during port scan) ======\n")
+    try:
+        logging.info(f"Starting banner grabbing on {domain}")
+        for port, banner in load("banner").iter_banners(domain, ctx["open_port_stream"]):
+            banner_results[port] = banner
+            print(f"[Port {port}] {banner}")
+            ctx["sink"].emit("banner", domain, port=port, banner=banner)
+        if banner_results:
+            logging.info(f"Banners grabbed on {domain}: {len(banner_results)}")
+        else:
+            print("Skipping Banner Grabbing (no open ports found).")
+            logging.warning(f"Banner grabbing skipped: no open ports found on {domain}")
+    except Exception as e:
+        print(f"Error in Banner Grabbing: {e}")
+        logging.error(f"Banner Grabbing Error: {e}")
+    banner_results = dict(sorted(banner_results.items()))
+    ctx["result"].banners = banner_results
+    return {"banners": banner_results}
 
-[Subdomain Enumeration]
-{chr(10).join(subdomains) if subdomains else "No subdomains or skipped."}
+def stage_tech(ctx):
+    url = ctx["url"]
+    tech_result = set()
+    detection = TechResult()
+    print("\n====== TECHNOLOGY DETECTION (Wappalyzer) ======\n")
+    try:
+        logging.info(f"Starting technology detection on {url}")
+        # Reuse the page the banner stage already fetched, if any
+        tech_result = load("tech").detect_with_wappalyzer(url, response=load("banner").get_cached_response(url))
+        if isinstance(tech_result, set):
+            print("Detected Technologies:")
+            for tech in tech_result:
+                print(f"- {tech}")
+            logging.info(f"Technologies detected on {url}: {len(tech_result)}")
+            detection.technologies = sorted(tech_result)
+            for name in detection.technologies:
+                ctx["sink"].emit("tech", ctx["domain"], name=name)
+        elif isinstance(tech_result, dict) and "error" in tech_result:
+            detection.error = tech_result["error"]
+            print(tech_result["error"])
+            logging.warning(f"Technology detection error on {url}: {tech_result['error']}")
+        else:
+            print("No technologies detected or unexpected result.")
+            logging.info(f"No technologies detected on {url}")
+    except Exception as e:
+        detection.error = str(e)
+        print(f"Error in Technology Detection: {e}")
+        logging.error(f"Technology Detection Error: {e}")
+    if detection.error:
+        ctx["sink"].emit("error", ctx["domain"], section="Technology Detection", message=detection.error)
+    ctx["result"].tech = detection
+    return {"tech": tech_result}
 
-[WHOIS Lookup]
-{whois_data if isinstance(whois_data, str) else str(whois_data)}
+def stage_subdomain_hosts(ctx):
+    subdomain_hosts = []
+    if not ctx["subdomains"]:
+        ctx["result"].subdomain_hosts = subdomain_hosts
+        return {"subdomain_hosts": subdomain_hosts}
+    print("\n====== SUBDOMAIN HOSTS (resolved & de-duplicated) ======\n")
+    try:
+        subdomain_hosts = scan_subdomain_hosts(ctx["args"], ctx["domain"], ctx["subdomains"], ctx["sink"])
+    except Exception as e:
+        print(f"Error in Subdomain Host Scanning: {e}")
+        logging.error(f"Subdomain Host Scanning Error: {e}")
+    ctx["result"].subdomain_hosts = subdomain_hosts
+    return {"subdomain_hosts": subdomain_hosts}
 
-[DNS Enumeration]
-{chr(10).join(f"{k}: {', '.join(v)}" for k, v in dns_results.items()) if dns_results else "No DNS records or skipped."}
+# Outputs of a stage the checkpoint says finished, rebuilt from the restored result
+RESUMED_OUTPUTS = {
+    "resolve": lambda result: {"resolved_ip": result.resolved_ip},
+    "subdomains": lambda result: {"subdomains": result.subdomains or []},
+    "whois": lambda result: {"whois": result.whois},
+    "dns": lambda result: {"dns": result.dns},
+    "ports": lambda result: {"open_port_stream": Stream(result.ports.open_ports),
+                             "open_ports": result.ports.open_ports},
+    "banners": lambda result: {"banners": result.banners},
+    "tech": lambda result: {"tech": set(result.tech.technologies)},
+    "subdomain_hosts": lambda result: {"subdomain_hosts": result.subdomain_hosts},
+}
 
-[Open Ports]
-{chr(10).join(str(p) for p in open_ports) if open_ports else "No open ports or skipped."}
+def resumable(stage, checkpoint, domain, finished):
+    run = stage.func
+
+    def run_or_restore(ctx):
+        if stage.name in finished:
+            print(f"\n====== {stage.name.upper()}: restored from checkpoint ======\n")
+            return RESUMED_OUTPUTS[stage.name](ctx["result"])
+        outputs = run(ctx)
+        checkpoint.finish_stage(domain, stage.name, ctx["result"])
+        return outputs
+
+    stage.func = run_or_restore
+    return stage
+
+def build_stages(args):
+    stages = [Stage("resolve", stage_resolve, provides=["resolved_ip"])]
+    if args.subdomains:
+        stages.append(Stage("subdomains", stage_subdomains, provides=["subdomains"]))
+    if args.whois:
+        stages.append(Stage("whois", stage_whois, provides=["whois"]))
+    if args.dns:
+        stages.append(Stage("dns", stage_dns, provides=["dns"]))
+    if args.ports:
+        stages.append(Stage("ports", stage_ports, provides=["open_port_stream", "open_ports"]))
+        if args.banner:
+            stages.append(Stage("banners", stage_banners, requires=["open_port_stream"], provides=["banners"],
+                                buffered=False))
+    if args.tech:
+        # With banners enabled, wait for them so the fetched page can be reused
+        requires = ["banners"] if args.ports and args.banner else []
+        stages.append(Stage("tech", stage_tech, requires=requires, provides=["tech"]))
+    if args.expand:
+        stages.append(Stage("subdomain_hosts", stage_subdomain_hosts, requires=["subdomains"],
+                            provides=["subdomain_hosts"]))
+    return stages
+
+def run_target(args, domain, scheme, sink, checkpoint, history, scan_result=None):
+    url = f"{scheme}://{domain}"
+    if args.banner and not args.ports:
+        print("\nSkipping Banner Grabbing (no open ports found).")
+        logging.warning(f"Banner grabbing skipped: no open ports found on {domain}")
 
-[Banner Grabbing]
-{chr(10).join(f"Port {p}: {b}" for p, b in banner_results.items()) if banner_results else "No banners or skipped."}
+    previous = history.latest(domain) if history else None
+    port_set, port_slice_index = plan_ports(args, history, domain) if args.ports else (None, None)
+    finished, saved = checkpoint.finished_stages(domain)
+    result = ReconResult.from_dict(saved) if saved else ReconResult(domain=domain, url=url)
+    sink.emit("target", domain, url=url, timestamp=result.timestamp)
+    stages = [resumable(stage, checkpoint, domain, finished) for stage in build_stages(args)]
+    pipeline = Pipeline(stages)
+    pipeline.run({"args": args, "domain": domain, "url": url, "scan_result": scan_result, "port_set": port_set,
+                  "port_slice": port_slice_index, "result": result, "sink": sink, "checkpoint": checkpoint})
 
-[Technology Detection]
-{chr(10).join(tech_result) if isinstance(tech_result, set) and tech_result else "No technologies or skipped."}
-"""
+    print("\n====== STAGE TIMINGS ======\n")
+    print(pipeline.summary())
+    logging.info(f"Stage timings for {domain}: "
+                 + ", ".join(f"{name}={end - start:.2f}s" for name, (start, end) in pipeline.timings.items())
+                 + f"; critical path: {' -> '.join(pipeline.critical_path())}")
+    result.stage_timings = {name: round(end - start, 3) for name, (start, end) in pipeline.timings.items()}
+    sink.emit("stage_timings", domain, timings=result.stage_timings)
 
-    # Save reports
-    save_report(domain, report_data, format="txt")
-    generate_html_report(domain, report_data)
+    # === Reports ===
+    save_report(result, format="txt")
+    save_report(result, format="json")
 
+    # === Changes since the previous run ===
+    if args.diff:
+        print("\n====== CHANGES SINCE PREVIOUS RUN ======\n")
+        if previous is None:
+            print("No previous run of this target; everything above is new.")
+        else:
+            changes = diff_results(previous, result)
+            lines = format_diff(changes)
+            print(f"Compared with {previous.timestamp}:")
+            print("\n".join(lines) if lines else "No changes.")
+            logging.info(f"Changes on {domain} since {previous.timestamp}: {len(lines)}")
+            save_diff(result, changes)
+    if history:
+        history.record(result)
+    checkpoint.finish_target(domain)
 
 if __name__ == "__main__":
     main()